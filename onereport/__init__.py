@@ -102,4 +102,8 @@ def create_app(config: Any = None, /) -> flask.Flask:
 
     register_filters(app)
 
+    from onereport import jobs
+
+    jobs.start(app)
+
     return app
@@ -1,6 +1,7 @@
 import json
 from onereport.data.misc import Company
 from onereport.dal import (
+    archive_dal,
     personnel_dal,
     user_dal,
     report_dal,
@@ -8,7 +9,7 @@ from onereport.dal import (
     UserOrderBy,
     PersonnelOrderBy,
 )
-from onereport.data import Personnel, User
+from onereport.dal.bulk_import import ImportSummary
 from onereport.dto.user_dto import UserDTO
 from onereport.dto.personnel_dto import PersonnelDTO
 from onereport.exceptions import BadRequestError, NotFoundError, InternalServerError
@@ -31,7 +32,7 @@ def get_all_users(order_by: str, order: str, /) -> list[UserDTO]:
         current_app.logger.error(f"invalid order: {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    users = user_dal.find_all_users(UserOrderBy[order_by], Order[order])
+    users = user_dal.find_all_users(UserOrderBy[order_by], Order[order], rows=True)
     if not users:
         current_app.logger.warning("USER table is empty")
         raise NotFoundError("רשימת המשתמשים הינה ריקה")
@@ -67,7 +68,7 @@ def get_all_personnel(
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
     personnel = personnel_dal.find_all_personnel_by_company(
-        Company[company], PersonnelOrderBy[order_by], Order[order]
+        Company[company], PersonnelOrderBy[order_by], Order[order], rows=True
     )
     if not personnel:
         current_app.logger.warning(f"there are no personnel for company {company}")
@@ -76,92 +77,45 @@ def get_all_personnel(
 
 
 def delete_report(id: int) -> None:
-    report = report_dal.find_report_by_id(id)
+    report, dal = report_dal.find_report_by_id(id), report_dal
+    if report is None:
+        # reports of closed months are deleted from the archive
+        report, dal = archive_dal.find_report_by_id(id), archive_dal
 
     if report is None:
         current_app.logger.error(f"{current_user} supplied a wrong id {id}")
         raise NotFoundError(f"הדוח {id} אינו קיים")
 
-    if not report_dal.delete(report):
+    if not dal.delete(report):
         raise InternalServerError(f"שגיאת שרת: הדוח {id} לא נמחק")
 
 
-def delete_all_reports() -> None:
-    reports = report_dal.find_all_reports()
-    report_dal.delete_all(reports)
-
-    current_app.logger.info(
-        f"{current_user} deleted all reports\n{chr(10).join([report.__str__() for report in reports])}"
-    )
+def delete_all_reports() -> bool:
+    deleted = report_dal.delete_all()
+    if deleted is None:
+        current_app.logger.error(f"{current_user} failed to delete all reports")
+        return False
 
+    current_app.logger.info(f"{current_user} deleted all {deleted} reports")
+    return True
 
-def delete_all_personnel() -> None:
-    personnel = personnel_dal.find_all_personnel(PersonnelOrderBy.ID, Order.ASC)
-    users = user_dal.find_all_users(UserOrderBy.LAST_NAME, Order.ASC)
 
-    user_dal.delete_all([u for u in users if u.id != current_user.id])
-    personnel_dal.delete_all([p for p in personnel if p.id != current_user.id])
+def delete_all_personnel() -> bool:
+    deleted = personnel_dal.delete_all({current_user.id})
+    if deleted is None:
+        current_app.logger.error(f"{current_user} failed to delete all personnel")
+        return False
 
+    users, personnel = deleted
     current_app.logger.info(
-        f"{current_user} deleted all users & personnel\n{chr(10).join([user.__str__() for user in users])}\n{chr(10).join([p.__str__() for p in personnel])}"
-    )
-
-
-def dict_to_personnel(personnel_dict: dict[str]) -> Personnel | None:
-    if not personnel_dict:
-        return None
-
-    if personnel_dict.get("id", None) is None:
-        return None
-    if personnel_dict.get("first_name", None) is None:
-        return None
-    if personnel_dict.get("last_name", None) is None:
-        return None
-    if personnel_dict.get("company", None) is None:
-        return None
-    if personnel_dict.get("platoon", None) is None:
-        return None
-
-    return Personnel(
-        personnel_dict["id"],
-        personnel_dict["first_name"],
-        personnel_dict["last_name"],
-        personnel_dict["company"],
-        personnel_dict["platoon"],
-    )
-
-
-def dict_to_user(user_dict: dict[str]) -> User | None:
-    if not user_dict:
-        return None
-
-    if user_dict.get("id", None) is None:
-        return None
-    if user_dict.get("email", None) is None:
-        return None
-    if user_dict.get("first_name", None) is None:
-        return None
-    if user_dict.get("last_name", None) is None:
-        return None
-    if user_dict.get("role", None) is None:
-        return None
-    if user_dict.get("company", None) is None:
-        return None
-    if user_dict.get("platoon", None) is None:
-        return None
-
-    return User(
-        user_dict["id"],
-        user_dict["email"],
-        user_dict["first_name"],
-        user_dict["last_name"],
-        user_dict["role"],
-        user_dict["company"],
-        user_dict["platoon"],
+        f"{current_user} deleted all {users} users & {personnel} personnel"
     )
+    return True
 
 
-def upload_personnel(form: UploadPersonnelForm) -> None:
+def upload_personnel(
+    form: UploadPersonnelForm,
+) -> tuple[ImportSummary, ImportSummary] | None:
     """
     Raises:
         BadRequestError,
@@ -176,30 +130,25 @@ def upload_personnel(form: UploadPersonnelForm) -> None:
         if file is None or not file:
             raise InternalServerError("שגיאת שרת")
 
-        data = json.load(file.stream)
-        personnel = list(
-            filter(
-                lambda p: p is not None,
-                map(lambda p: dict_to_personnel(p), data.get("Personnel", [])),
-            )
-        )
-        users = list(
-            filter(
-                lambda u: u is not None,
-                map(lambda u: dict_to_user(u), data.get("Users", [])),
-            )
-        )
+        try:
+            data = json.load(file.stream)
+        except (UnicodeDecodeError, ValueError):
+            current_app.logger.error(f"{file.filename} isn't a valid json")
+            raise BadRequestError(f"הקובץ {file.filename} אינו קובץ JSON תקין")
 
-        if not personnel_dal.save_all(personnel):
-            current_app.logger.warning("not all personnel were saved")
-        else:
-            current_app.logger.info(
-                f"{current_user} uploaded {len(personnel)} personnel:\n{chr(10).join([p.__str__() for p in personnel])}"
-            )
+        personnel = personnel_dal.save_all(data.get("Personnel", []))
+        users = user_dal.save_all(data.get("Users", []))
 
-        if not user_dal.save_all(users):
-            current_app.logger.warning("not all users were saved")
-        else:
+        for kind, summary in (("personnel", personnel), ("users", users)):
             current_app.logger.info(
-                f"{current_user} uploaded {len(users)} personnel:\n{chr(10).join([user.__str__() for user in users])}"
+                f"{current_user} uploaded {kind}: {summary}\n"
+                f"inserted: {summary.inserted}\nupdated: {summary.updated}"
             )
+            if summary.rejected:
+                current_app.logger.warning(
+                    f"rejected {kind}: {', '.join(f'{id} ({reason})' for id, reason in summary.rejected)}"
+                )
+
+        return personnel, users
+
+    return None
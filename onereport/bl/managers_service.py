@@ -1,12 +1,14 @@
-from flask_sqlalchemy.pagination import Pagination
 from flask import request, current_app
 from flask_login import current_user
 from onereport.data.misc import Active, Company, Role
-from onereport.data import Personnel, User, Report
+from onereport.data import ArchivedReport, Personnel, User
 from onereport.dto.personnel_dto import PersonnelDTO
 from onereport.dto.report_dto import UnifiedReportDTO, ReportDTO
 from onereport.dto.user_dto import UserDTO
+from onereport.dal import keyset
+from onereport.dal.keyset import Page
 from onereport.dal import (
+    archive_dal,
     personnel_dal,
     user_dal,
     report_dal,
@@ -91,29 +93,21 @@ def promote(personnel: Personnel, user: User, /) -> None:
         current_app.logger.warning(f"{current_user} tried to demote themselves")
         raise ForbiddenError("אינך רשאי.ת לבצע פעולה זו")
 
-    # delete the personnel since it has the same id as the newly created user
-    if not personnel_dal.delete(personnel):
-        current_app.logger.error(f"failed to delete {personnel} for {current_user}")
-        raise InternalServerError("שגיאת שרת")
-
-    current_app.logger.info(f"{current_user} successfully deleted {personnel}")
-
-    user.dates_present = personnel.dates_present
-    for report in user.dates_present:
-        report.presence.add(user)
+    if isinstance(personnel, User):
+        current_app.logger.warning(
+            f"{current_user} tried to promote {personnel} which is already a user"
+        )
+        raise ForbiddenError("משתמש.ת עם מס' אישי זה כבר רשום.ה במערכת")
 
-    # save the newly created user
-    if not user_dal.save(user):
-        current_app.logger.error(f"failed to save {personnel} for {current_user}")
-        # try to reinstate personnel
-        # if this fails we're in as irrecoverable state
-        if not personnel_dal.save(personnel):
-            current_app.logger.critical(
-                f"failed to reinstate previous state. personnel has been deleted yet no user has been saved, and attemps to resave the old personnel fails\n{personnel}"
-            )
+    # the personnel is expunged once it's promoted
+    personnel_str = f"{personnel}"
+    if not user_dal.promote(user):
+        current_app.logger.error(f"failed to promote {personnel_str} for {current_user}")
         raise InternalServerError("שגיאת שרת")
 
-    current_app.logger.info(f"{current_user} successfully deleted {personnel}")
+    current_app.logger.info(
+        f"{current_user} successfully promoted {personnel_str} to {user}"
+    )
 
 
 def register_user(form: UserRegistrationFrom, id: str, /) -> PersonnelDTO:
@@ -249,35 +243,13 @@ def demote(user: User) -> None:
         current_app.logger.warning(f"{current_user} tried to demote themselves")
         raise ForbiddenError("אינך רשאי.ת לבצע פעולה זו")
 
-    if not user_dal.delete(user):  # delete user since it has the same id
-        current_app.logger.error(f"{current_user} failed to delete {user}")
+    # the user is expunged once it's demoted
+    user_str = f"{user}"
+    if not user_dal.demote(user):
+        current_app.logger.error(f"{current_user} failed to demote {user_str}")
         raise InternalServerError("הפעולה לא הושלמה בהצלחה")
 
-    current_app.logger.info(f"{current_user} successfully deleted {user}")
-
-    personnel = Personnel(
-        user.id, user.first_name, user.last_name, user.company, user.platoon
-    )
-
-    personnel.dates_present = user.dates_present
-    for report in personnel.dates_present:
-        report.presence.add(personnel)
-
-    if not personnel_dal.save(personnel):
-        current_app.logger.error(
-            f"{current_user} failed to save the personnel {personnel}. demotion failed"
-        )
-
-        # if this operation failed we're in an irrecoverable state
-        if not user_dal.save(user):
-            current_app.logger.critical(
-                f"failed to reinstate previous state. user has been deleted yet no personnel has been saved, and attemps to resave the old user fails\n{user}"
-            )
-        raise InternalServerError("שגיאת שרת")
-
-    current_app.logger.info(
-        f"{current_user} successfuly demoted {user} to a personnel {personnel}"
-    )
+    current_app.logger.info(f"{current_user} successfuly demoted {user_str} to a personnel")
 
 
 def update_user(form: UserUpdateForm, email: str, /) -> UserDTO:
@@ -301,12 +273,15 @@ def update_user(form: UserUpdateForm, email: str, /) -> UserDTO:
 
     if form.validate_on_submit():
         if form.delete.data:
+            # the user is no more, there's nothing left to update
+            user_dto = UserDTO(old_user)
             try:
                 demote(old_user)
             except ForbiddenError:
                 raise
             except InternalServerError:
                 raise
+            return user_dto
 
         user = User(
             old_user.id,
@@ -365,7 +340,9 @@ def get_all_users(order_by: str, order: str, /) -> list[UserDTO]:
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    users = user_dal.find_all_active_users(UserOrderBy[order_by], Order[order])
+    users = user_dal.find_all_active_users(
+        UserOrderBy[order_by], Order[order], rows=True
+    )
     if not users:
         current_app.logger.debug(f"there are no visible users for {current_user}")
         raise NotFoundError("לא נמצאו משתמשים")
@@ -407,7 +384,7 @@ def get_all_personnel(
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
     personnel = personnel_dal.find_all_active_personnel_by_company(
-        Company[company], PersonnelOrderBy[order_by], Order[order]
+        Company[company], PersonnelOrderBy[order_by], Order[order], rows=True
     )
     if not personnel:
         current_app.logger.debug(
@@ -442,22 +419,8 @@ def report(
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    report = report_dal.find_report_by_date_and_company(
-        datetime.date.today(), Company[company]
-    )
-
-    # no existing report for the current day
-    if report is None:
-        report = Report(Company[company].name, current_user)
-        if not report_dal.save(report):
-            current_app.logger.error(
-                f"{current_user} failed to create a report for company: {company} at {datetime.date.today()}"
-            )
-            raise InternalServerError("שגיאת שרת")
-        current_app.logger.info(f"{current_user} successfully created {report}")
-
     personnel = personnel_dal.find_all_active_personnel_by_company(
-        Company[company], PersonnelOrderBy[order_by], Order[order]
+        Company[company], PersonnelOrderBy[order_by], Order[order], rows=True
     )
 
     if not personnel:
@@ -468,21 +431,26 @@ def report(
             f"אין חיילים.ות במאגר השייכים לפלוגה {Company[company].value}"
         )
 
-    # there is an exisiting report for the day
+    # a plain GET only reads. the report is created by its first submission
+    date = datetime.date.today()
     if form.validate_on_submit():
-        presence = {p for p in personnel if p.id in request.form}
-        if not report_dal.update(report, presence, current_user):
+        presence = {p.id for p in personnel if p.id in request.form}
+        report = report_dal.submit(date, Company[company], presence, current_user)
+        if report is None:
             current_app.logger.error(
-                f"{current_user} failed to update the report {report}"
-            )
-            raise InternalServerError(
-                f"הדוח ליום {datetime.date.today()} לא נשלח", category="danger"
+                f"{current_user} failed to submit the report of company {company} at {date}"
             )
+            raise InternalServerError(f"הדוח ליום {date} לא נשלח", category="danger")
+
         current_app.logger.info(
             f"{current_user} successfully updated the report {report}"
         )
+    else:
+        presence = report_dal.find_all_present_ids_by_date_and_company(
+            date, Company[company]
+        )
 
-    return [(PersonnelDTO(p), p in report.presence) for p in personnel]
+    return [(PersonnelDTO(p), p.id in presence) for p in personnel]
 
 
 def get_report(id: str, company: str, /) -> ReportDTO:
@@ -496,14 +464,17 @@ def get_report(id: str, company: str, /) -> ReportDTO:
         raise BadRequestError("פלוגה אינה תקינה")
 
     report = report_dal.find_report_by_id_and_company(id, Company[company])
+    if report is None:
+        # reports of closed months are served from the archive
+        report = archive_dal.find_report_by_id_and_company(id, Company[company])
     if report is None:
         current_app.logger.error(
             f"{current_user} tried to get a non existing report with id {id} for company {current_user.company}"
         )
         raise NotFoundError(f"הדוח {id} אינו במסד הנתונים")
 
-    personnel = personnel_dal.find_all_personnel_by_company_active_in(
-        Company[company], datetime.date.today(), PersonnelOrderBy.LAST_NAME, Order.ASC
+    personnel = personnel_dal.find_all_personnel_by_company_as_of(
+        Company[company], report.date, PersonnelOrderBy.LAST_NAME, Order.ASC
     )
     if personnel is None:
         current_app.logger.debug(
@@ -512,7 +483,12 @@ def get_report(id: str, company: str, /) -> ReportDTO:
         raise NotFoundError(
             f"אין חיילים.ות במאגר השייכים לפלוגה {Company[company].value}"
         )
-    return ReportDTO(report, personnel)
+    presence = (
+        archive_dal.find_all_present_ids_by_report(report)
+        if isinstance(report, ArchivedReport)
+        else report_dal.find_all_present_ids_by_report(report.id)
+    )
+    return ReportDTO(report, personnel, presence)
 
 
 def get_unified_report(
@@ -549,14 +525,7 @@ def get_unified_report(
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    reports = report_dal.find_all_reports_by_date(date)
-    if reports is None:
-        current_app.logger.error(
-            f"{current_user} tried to get a non existing report with for date{date}"
-        )
-        raise NotFoundError(f"לא נמצאו דוחות לתאריך {date.strftime('%d/%m/%Y')}")
-
-    personnel = personnel_dal.find_all_personnel_active_in(
+    personnel = personnel_dal.find_all_personnel_as_of(
         date, PersonnelOrderBy[order_by], Order[order]
     )
     if personnel is None:
@@ -565,14 +534,13 @@ def get_unified_report(
         )
         raise NotFoundError(f"אין חיילים רשומים במאגר עד תאריך {date}")
 
-    # couldn't think of something smarter
-    presence = {personnel for report in reports for personnel in report.presence}
-    return UnifiedReportDTO(date, presence, personnel)
+    presence = report_dal.find_all_present_ids_by_date(date)
+    return UnifiedReportDTO(date, personnel, presence)
 
 
 def get_all_reports_for(
-    company: str, order: str, page: str, per_page: str, /
-) -> Pagination:
+    company: str, order: str, cursor: str | None, per_page: str, /
+) -> Page:
     """
     Raises:
         BadRequestError
@@ -585,18 +553,16 @@ def get_all_reports_for(
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    try:
-        int(page)
-    except ValueError:
-        raise BadRequestError(f"הערך {page} עבור דף הינו שגוי")
+    if not report_dal.is_valid_cursor(cursor):
+        current_app.logger.error(f"invalid cursor {cursor}")
+        raise BadRequestError(f"הערך {cursor} עבור דף הינו שגוי")
 
-    try:
-        int(per_page)
-    except ValueError:
+    if not keyset.is_valid_per_page(per_page):
+        current_app.logger.error(f"invalid per page {per_page}")
         raise BadRequestError(f"הערך {per_page} עבור כמות עצמים בדף הינו שגוי")
 
     reports = report_dal.find_all_reports_by_company(
-        Company[company], Order[order], int(page), int(per_page)
+        Company[company], Order[order], cursor, int(per_page)
     )
     if not reports.items:
         current_app.logger.debug(
@@ -606,7 +572,7 @@ def get_all_reports_for(
     return reports
 
 
-def get_all_reports(order: str, page: str, per_page: str, /) -> Pagination:
+def get_all_reports(order: str, cursor: str | None, per_page: str, /) -> Page:
     """
     Raises:
         BadRequestError
@@ -615,17 +581,17 @@ def get_all_reports(order: str, page: str, per_page: str, /) -> Pagination:
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    try:
-        int(page)
-    except ValueError:
-        raise BadRequestError(f"הערך {page} עבור דף הינו שגוי")
+    if not report_dal.is_valid_distinct_cursor(cursor):
+        current_app.logger.error(f"invalid cursor {cursor}")
+        raise BadRequestError(f"הערך {cursor} עבור דף הינו שגוי")
 
-    try:
-        int(per_page)
-    except ValueError:
+    if not keyset.is_valid_per_page(per_page):
+        current_app.logger.error(f"invalid per page {per_page}")
         raise BadRequestError(f"הערך {per_page} עבור כמות עצמים בדף הינו שגוי")
 
-    reports = report_dal.find_all_distinct_reports(order, int(page), int(per_page))
+    reports = report_dal.find_all_distinct_reports(
+        Order[order], cursor, int(per_page)
+    )
     if not reports.items:
         current_app.logger.debug(
             f"no visible reports across all companies for {current_user}"
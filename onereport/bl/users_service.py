@@ -1,13 +1,14 @@
 import datetime
 
-from flask_sqlalchemy.pagination import Pagination
 from flask import request, current_app
 from flask_login import current_user
 from onereport.dto.personnel_dto import PersonnelDTO
 from onereport.dto.report_dto import ReportDTO
 from onereport.data.misc import Company, Active, Platoon
-from onereport.data import Personnel, Report
-from onereport.dal import personnel_dal, report_dal, Order, PersonnelOrderBy
+from onereport.data import ArchivedReport, Personnel
+from onereport.dal import archive_dal, personnel_dal, report_dal, Order, PersonnelOrderBy
+from onereport.dal import keyset
+from onereport.dal.keyset import Page
 from onereport.exceptions import (
     BadRequestError,
     ForbiddenError,
@@ -50,7 +51,7 @@ def get_all_personnel(
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
     personnel = personnel_dal.find_all_active_personnel_by_company(
-        Company[company], PersonnelOrderBy[order_by], Order[order]
+        Company[company], PersonnelOrderBy[order_by], Order[order], rows=True
     )
 
     if not personnel:
@@ -144,23 +145,8 @@ def report(
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    report = report_dal.find_report_by_date_and_company(
-        datetime.date.today(), Company[company]
-    )
-
-    # no existing report for the current day
-    if report is None:
-        report = Report(Company[company].name, current_user)
-        if not report_dal.save(report):
-            current_app.logger.error(
-                f"{current_user} failed to create a report for company: {company} at {datetime.date.today()}"
-            )
-            raise InternalServerError("שגיאת שרת")
-
-        current_app.logger.info(f"{current_user} successfully created {report}")
-
     personnel = personnel_dal.find_all_active_personnel_by_company(
-        Company[company], PersonnelOrderBy[order_by], Order[order]
+        Company[company], PersonnelOrderBy[order_by], Order[order], rows=True
     )
     if not personnel:
         current_app.logger.debug(f"no visibale personnel for {current_user}")
@@ -168,22 +154,26 @@ def report(
             f"אין חיילים.ות במאגר השייכים לפלוגה {Company[company].value}"
         )
 
-    # there is an exisiting report for the day
+    # a plain GET only reads. the report is created by its first submission
+    date = datetime.date.today()
     if form.validate_on_submit():
-        presence = {p for p in personnel if p.id in request.form}
-        if not report_dal.update(report, presence, current_user):
+        presence = {p.id for p in personnel if p.id in request.form}
+        report = report_dal.submit(date, Company[company], presence, current_user)
+        if report is None:
             current_app.logger.error(
-                f"{current_user} failed to update the report {report}"
-            )
-            raise InternalServerError(
-                f"הדוח ליום {datetime.date.today()} לא נשלח", category="danger"
+                f"{current_user} failed to submit the report of company {company} at {date}"
             )
+            raise InternalServerError(f"הדוח ליום {date} לא נשלח", category="danger")
 
         current_app.logger.info(
             f"{current_user} successfully updated the report {report}"
         )
+    else:
+        presence = report_dal.find_all_present_ids_by_date_and_company(
+            date, Company[company]
+        )
 
-    return [(PersonnelDTO(p), p in report.presence) for p in personnel]
+    return [(PersonnelDTO(p), p.id in presence) for p in personnel]
 
 
 def get_report(id: int, company: str, /) -> ReportDTO:
@@ -197,14 +187,17 @@ def get_report(id: int, company: str, /) -> ReportDTO:
         raise BadRequestError("פלוגה אינה תקינה")
 
     report = report_dal.find_report_by_id_and_company(id, Company[company])
+    if report is None:
+        # reports of closed months are served from the archive
+        report = archive_dal.find_report_by_id_and_company(id, Company[company])
     if report is None:
         current_app.logger.error(
             f"{current_user} tried to get a non existing report with id {id} for company {current_user.company}"
         )
         raise NotFoundError(f"הדוח {id} אינו במסד הנתונים")
 
-    personnel = personnel_dal.find_all_personnel_by_company_active_in(
-        Company[company], datetime.date.today(), PersonnelOrderBy.LAST_NAME, Order.ASC
+    personnel = personnel_dal.find_all_personnel_by_company_as_of(
+        Company[company], report.date, PersonnelOrderBy.LAST_NAME, Order.ASC
     )
     if personnel is None:
         current_app.logger.debug(
@@ -213,12 +206,17 @@ def get_report(id: int, company: str, /) -> ReportDTO:
         raise NotFoundError(
             f"אין חיילים.ות במאגר השייכים לפלוגה {Company[company].value}"
         )
-    return ReportDTO(report, personnel)
+    presence = (
+        archive_dal.find_all_present_ids_by_report(report)
+        if isinstance(report, ArchivedReport)
+        else report_dal.find_all_present_ids_by_report(report.id)
+    )
+    return ReportDTO(report, personnel, presence)
 
 
 def get_all_reports(
-    company: str, order: str, page: str, per_page: str, /
-) -> Pagination:
+    company: str, order: str, cursor: str | None, per_page: str, /
+) -> Page:
     """
     Raises:
         BadRequestError,
@@ -232,18 +230,16 @@ def get_all_reports(
         current_app.logger.error(f"invalid order {order}")
         raise BadRequestError(f"סדר {order} אינו נתמך")
 
-    try:
-        int(page)
-    except ValueError:
-        raise BadRequestError(f"הערך {page} עבור דף הינו שגוי")
+    if not report_dal.is_valid_cursor(cursor):
+        current_app.logger.error(f"invalid cursor {cursor}")
+        raise BadRequestError(f"הערך {cursor} עבור דף הינו שגוי")
 
-    try:
-        int(per_page)
-    except ValueError:
-        raise BadRequestError(f"הערך {page} עבור כמות עצמים בדף הינו שגוי")
+    if not keyset.is_valid_per_page(per_page):
+        current_app.logger.error(f"invalid per page {per_page}")
+        raise BadRequestError(f"הערך {per_page} עבור כמות עצמים בדף הינו שגוי")
 
     reports = report_dal.find_all_reports_by_company(
-        Company[company], Order[order], int(page), int(per_page)
+        Company[company], Order[order], cursor, int(per_page)
     )
     if not reports.items:
         current_app.logger.debug(
@@ -6,21 +6,67 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "SQLALCHEMY_DATABASE_URI", "sqlite:///site.db"
     )
+    # an optional read replica the dal's listings read from. see dal/routing.py
+    SQLALCHEMY_BINDS = (
+        {"replica": os.environ["SQLALCHEMY_REPLICA_URI"]}
+        if os.environ.get("SQLALCHEMY_REPLICA_URI")
+        else {}
+    )
+    # seconds a client keeps reading from the primary after it wrote
+    REPLICA_STICKINESS = int(os.environ.get("REPLICA_STICKINESS", 5))
     OAUTH2_PROVIDERS = {
         # Google OAuth 2.0 documentation:
         # https://developers.google.com/identity/protocols/oauth2/web-server#httprest
+        # https://developers.google.com/identity/openid-connect/openid-connect#validatinganidtoken
+        # every url can be overridden, e.g. to point at `util/oauth2_provider.py` locally
         "google": {
             "client_id": os.environ.get("GOOGLE_CLIENT_ID"),
             "client_secret": os.environ.get("GOOGLE_CLIENT_SECRET"),
-            "authorize_url": "https://accounts.google.com/o/oauth2/v2/auth",
-            "token_url": "https://oauth2.googleapis.com/token",
+            "authorize_url": os.environ.get(
+                "GOOGLE_AUTHORIZE_URL", "https://accounts.google.com/o/oauth2/v2/auth"
+            ),
+            "token_url": os.environ.get(
+                "GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token"
+            ),
+            "jwks_uri": os.environ.get(
+                "GOOGLE_JWKS_URI", "https://www.googleapis.com/oauth2/v3/certs"
+            ),
+            "issuers": os.environ.get(
+                "GOOGLE_ISSUERS", "https://accounts.google.com accounts.google.com"
+            ).split(),
             "userinfo": {
-                "url": "https://www.googleapis.com/oauth2/v3/userinfo",
+                "url": os.environ.get(
+                    "GOOGLE_USERINFO_URL",
+                    "https://www.googleapis.com/oauth2/v3/userinfo",
+                ),
                 "email": lambda json: json["email"],
             },
-            "scopes": ["https://www.googleapis.com/auth/userinfo.email"],
+            "scopes": ["openid", "https://www.googleapis.com/auth/userinfo.email"],
         }
     }
+    # (connect, read) seconds for every request to an oauth2 provider
+    OAUTH2_TIMEOUT = (
+        float(os.environ.get("OAUTH2_CONNECT_TIMEOUT", 3.05)),
+        float(os.environ.get("OAUTH2_READ_TIMEOUT", 5)),
+    )
     SCHEME = os.environ.get("SCHEME", "https")
     PHONE = os.environ.get("PHONE", None)
     EMAIL = os.environ.get("EMAIL", None)
+    # seconds a logged in user is served from memory. 0 disables the cache
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
+    # seconds a company roster queried from the db (no snapshot) is served from
+    # memory. 0 disables the cache
+    ROSTER_CACHE_TTL = int(os.environ.get("ROSTER_CACHE_TTL", 300))
+    # where the workers share the roster snapshot: a `roster` directory in the app's
+    # instance folder if unset, empty disables it
+    ROSTER_SNAPSHOT_DIR = os.environ.get("ROSTER_SNAPSHOT_DIR")
+    # how report presence is written: "table" (a row per present personnel) or
+    # "bitmap" (a compressed bitmap per report). either is read
+    PRESENCE_STORAGE = os.environ.get("PRESENCE_STORAGE", "table")
+    # closed months whose reports stay in the hot tables, older ones are archived by
+    # `commands archive_reports`
+    REPORT_ARCHIVE_MONTHS = int(os.environ.get("REPORT_ARCHIVE_MONTHS", 3))
+    # seconds between every worker's purges of the empty reports. 0 disables them
+    EMPTY_REPORTS_PURGE_INTERVAL = int(
+        os.environ.get("EMPTY_REPORTS_PURGE_INTERVAL", 3600)
+    )
@@ -156,7 +156,7 @@ def get_all_reports() -> str:
 
     company = request.args.get("company", default=current_user.company)
     order = request.args.get("order", default=Order.DESC.name)
-    page = request.args.get("page", "1")
+    cursor = request.args.get("cursor")
     per_page = request.args.get("per_page", "20")
 
     return redirect(
@@ -164,7 +164,7 @@ def get_all_reports() -> str:
             generate_url(misc.Role.MANAGER.name, "get_all_reports"),
             company=company,
             order=order,
-            page=page,
+            cursor=cursor,
             per_page=per_page,
         )
     )
@@ -200,15 +200,15 @@ def get_all_unified_reports() -> str:
         )
 
     order = request.args.get("order", Order.DESC.name)
-    page = request.args.get("page", "1")
+    cursor = request.args.get("cursor")
     per_page = request.args.get("per_page", "20")
 
     return redirect(
         url_for(
             generate_url(misc.Role.MANAGER.name, "get_all_unified_reports"),
             order=order,
-            page=page,
-            per_pageg=per_page,
+            cursor=cursor,
+            per_page=per_page,
         )
     )
 
@@ -246,12 +246,25 @@ def upload_personnel() -> str:
 
     form = forms.UploadPersonnelForm()
     try:
-        admins_service.upload_personnel(form)
+        summaries = admins_service.upload_personnel(form)
     except BadRequestError as be:
         return render_template("errors/error.html", error=be)
     except InternalServerError as ie:
         return render_template("errors/error.html", error=ie)
 
+    if summaries is not None:
+        for kind, summary in zip(("חיילים", "משתמשים"), summaries):
+            flash(
+                f"{kind}: {len(summary.inserted)} נוספו, {len(summary.updated)} עודכנו",
+                category="success",
+            )
+            if summary.rejected:
+                flash(
+                    f"{kind}: {len(summary.rejected)} נדחו - "
+                    f"{', '.join(f'{id} ({reason})' for id, reason in summary.rejected)}",
+                    category="danger",
+                )
+
     return render_template("personnel/upload_personnel.html", form=form)
 
 
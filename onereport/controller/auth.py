@@ -10,8 +10,8 @@ from flask import (
     session,
 )
 from flask_login import current_user, login_user
+from onereport.controller import oauth2
 import secrets
-import requests
 import urllib.parse as urllib_parse
 
 
@@ -32,8 +32,10 @@ def oauth2_authorize(provider: str):
         current_app.logger.error(f"no oauth2 config for provider {provider}")
         abort(404)
 
-    # generate a random string for the state parameter
+    # generate a random string for the state parameter, and another one binding the
+    # id token to this very login attempt
     session["oauth2_state"] = secrets.token_urlsafe(16)
+    session["oauth2_nonce"] = secrets.token_urlsafe(16)
 
     # create a query string with all the OAuth2 parameters
     query_params = urllib_parse.urlencode(
@@ -48,6 +50,7 @@ def oauth2_authorize(provider: str):
             "response_type": "code",
             "scope": " ".join(provider_data["scopes"]),
             "state": session["oauth2_state"],
+            "nonce": session["oauth2_nonce"],
         }
     )
 
@@ -90,59 +93,21 @@ def oauth2_callback(provider: str):
         current_app.logger.error("authorization code is not present")
         abort(401)
 
-    # exchange the authorization code for an access token
-    body = {
-        "client_id": provider_data["client_id"],
-        "client_secret": provider_data["client_secret"],
-        "code": request.args["code"],
-        "grant_type": "authorization_code",
-        "redirect_uri": url_for(
-            "auth.oauth2_callback",
-            _scheme=current_app.config["SCHEME"],
-            provider=provider,
-            _external=True,
-        ),
-    }
-    current_app.logger.debug(
-        f"trying to exchange the authorization code for an access token - request body:\n{body}"
+    # exchange the authorization code for an access token & an id token, then take
+    # the email from the (locally verified) id token
+    redirect_uri = url_for(
+        "auth.oauth2_callback",
+        _scheme=current_app.config["SCHEME"],
+        provider=provider,
+        _external=True,
     )
-    response = requests.post(
-        provider_data["token_url"],
-        data=body,
-        headers={"Accept": "current_application/json"},
-    )
-    current_app.logger.debug(f"got back: {response.status_code}\n{response.json()}")
-
-    if response.status_code != 200:
-        current_app.logger.error(
-            f"didn't got an access token. response code {response.status_code}"
-        )
-        abort(401)
-
-    oauth2_token = response.json().get("access_token")
-    if not oauth2_token:
-        current_app.logger.error(f"invalid access token {oauth2_token}")
+    try:
+        token = oauth2.exchange_code(provider_data, request.args["code"], redirect_uri)
+        email = oauth2.get_email(provider_data, token, session.pop("oauth2_nonce", None))
+    except oauth2.OAuth2Error as oe:
+        current_app.logger.error(f"failed to get the user's email: {oe}")
         abort(401)
 
-    # use the access token to get the user's email address
-    current_app.logger.debug("trying to get user's email")
-    response = requests.get(
-        provider_data["userinfo"]["url"],
-        headers={
-            "Authorization": f"Bearer {oauth2_token}",
-            "Accept": "current_application/json",
-        },
-    )
-    current_app.logger.debug(f"got back: {response.status_code}\n{response.json()}")
-
-    if response.status_code != 200:
-        current_app.logger.debug(
-            f"failed to get user email. response code: {response.status_code}"
-        )
-        abort(401)
-
-    email = provider_data["userinfo"]["email"](response.json()).lower()
-
     # find the user in the database
     user = user_dal.find_user_by_email(email)
     if user is None or not user.active:
@@ -1,8 +1,18 @@
 import json
 import click
-from onereport.data import db, User, Personnel
-from onereport.dal import personnel_dal, user_dal
-from flask import Blueprint
+import datetime
+from onereport.data import db, migrations, partitions, User, Personnel
+from onereport.dal import (
+    archive_dal,
+    partition_dal,
+    personnel_dal,
+    report_dal,
+    summary_dal,
+    user_dal,
+    versions,
+)
+from onereport.dal.bulk_import import ImportSummary
+from flask import Blueprint, current_app
 
 commands = Blueprint("commands", __name__)
 
@@ -35,20 +45,27 @@ def personnel_converter(_json: dict[str, str], /) -> Personnel:
     )
 
 
+def echo_summary(kind: str, summary: ImportSummary, /) -> None:
+    click.echo(
+        f"{kind}: {len(summary.inserted)} inserted, {len(summary.updated)} updated, "
+        f"{len(summary.rejected)} rejected"
+    )
+    for id, reason in summary.rejected:
+        click.echo(f"  {id}: {reason}")
+
+
 def bulk_register_users(users: list[dict[str, str]], /) -> None:
     if users is None:
         return
 
-    users = [user_converter(user) for user in users]
-    user_dal.save_all(users)
+    echo_summary("users", user_dal.save_all(users))
 
 
 def bulk_register_personnel(personnel: list[dict[str, str]], /) -> None:
     if personnel is None:
         return
 
-    personnel = [personnel_converter(p) for p in personnel]
-    personnel_dal.save_all(personnel)
+    echo_summary("personnel", personnel_dal.save_all(personnel))
 
 
 @commands.cli.command("register_users")
@@ -87,7 +104,104 @@ def db_register_personnel(personnel_as_json: str) -> None:
 @commands.cli.command("db_create")
 def db_create() -> None:
     db.create_all()
+    # a new database starts new epochs, see `data_version`
+    versions.bump(versions.ROSTER)
+    versions.bump(versions.USERS)
     db.session.commit()
+    migrations.stamp(db.engine)
+
+
+@commands.cli.command("db_migrate")
+def db_migrate() -> None:
+    for migration in migrations.upgrade(db.engine):
+        click.echo(f"applied {migration.version}: {migration.description}")
+
+    with db.engine.connect() as connection:
+        click.echo(f"schema version: {migrations.current_version(connection)}")
+
+
+@commands.cli.command("db_missing_indexes")
+def db_missing_indexes() -> None:
+    missing = migrations.missing_indexes(db.engine)
+    for index in missing:
+        columns = ", ".join(str(expression) for expression in index.expressions)
+        click.echo(f"{index.table.name}: {index.name} ({columns})")
+
+    if not missing:
+        click.echo("no missing indexes")
+
+
+# e.g. after editing the personnel or report tables by hand, which the summaries
+# don't follow
+@commands.cli.command("rebuild_summary")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), default=None)
+def rebuild_summary(start: datetime.datetime | None, end: datetime.datetime | None) -> None:
+    rows = summary_dal.rebuild(
+        start.date() if start else None, end.date() if end else None
+    )
+    if rows is None:
+        click.echo("failed to rebuild the presence summary")
+        return
+    click.echo(f"rebuilt {rows} presence summary rows")
+
+
+# keeps the reports of the last `keep` months (this one included) and retires the
+# older ones, see `partition_dal.retire`. also creates the partitions of the next
+# month ahead of its first submission. meant to run monthly (e.g. by cron)
+@commands.cli.command("rotate_partitions")
+@click.option("--keep", type=click.IntRange(min=1), default=24)
+@click.option("--drop", is_flag=True, help="drop the retired partitions (postgres)")
+@click.option(
+    "--delete",
+    is_flag=True,
+    help="delete the retired reports (sqlite, which has no partitions to detach). "
+    "without it the reports are kept & nothing is retired, run archive_reports first",
+)
+def rotate_partitions(keep: int, drop: bool, delete: bool) -> None:
+    today = datetime.date.today()
+    if not partition_dal.prepare(today):
+        click.echo("failed to create the upcoming partitions")
+        return
+
+    before = partitions.months_before(partitions.month_of(today), keep - 1)
+    retired = partition_dal.retire(before, drop=drop, delete=delete)
+    if retired is None:
+        click.echo("failed to retire the old partitions")
+        return
+    for month in retired:
+        click.echo(f"retired {month:%Y-%m}")
+    click.echo(f"retired {len(retired)} months, kept the reports since {before}")
+
+
+# moves the reports of the months before the last `months` closed ones into the
+# archive (`REPORT_ARCHIVE_MONTHS` by default), see `archive_dal.archive`. run it
+# before `rotate_partitions`, which then retires the emptied partitions
+@commands.cli.command("archive_reports")
+@click.option("--months", type=click.IntRange(min=0), default=None)
+def archive_reports(months: int | None) -> None:
+    if months is None:
+        months = current_app.config.get("REPORT_ARCHIVE_MONTHS", 3)
+
+    before = partitions.months_before(
+        partitions.month_of(datetime.date.today()), months
+    )
+    archived = archive_dal.archive(before)
+    if archived is None:
+        click.echo("failed to archive the reports")
+        return
+    click.echo(f"archived {archived} reports dated before {before}")
+
+
+# also runs every `EMPTY_REPORTS_PURGE_INTERVAL` seconds within the serving app
+@commands.cli.command("purge_empty_reports")
+@click.option("--batch-size", type=click.IntRange(min=1), default=1000)
+def purge_empty_reports(batch_size: int) -> None:
+    deleted = report_dal.delete_all_empty_reports(batch_size)
+    if deleted is None:
+        click.echo("failed to purge the empty reports")
+        return
+    click.echo(f"purged {deleted} empty reports")
 
 
 @commands.cli.command("db_destroy")
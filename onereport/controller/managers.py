@@ -282,12 +282,12 @@ def get_all_reports() -> str:
 
     company = request.args.get("company", current_user.company)
     order = request.args.get("order", Order.DESC.name)
-    page = request.args.get("page", "1")
+    cursor = request.args.get("cursor")
     per_page = request.args.get("per_page", "20")
 
     try:
         pagination = managers_service.get_all_reports_for(
-            company, order, page, per_page
+            company, order, cursor, per_page
         )
         return render_template(
             "reports/reports.html",
@@ -296,7 +296,7 @@ def get_all_reports() -> str:
             current_company=(
                 misc.Company[company].name if misc.Company.is_valid(company) else ""
             ),
-            page=page,
+            order=order,
             per_page=per_page,
         )
     except BadRequestError as be:
@@ -313,15 +313,15 @@ def get_all_unified_reports() -> str:
         )
 
     order = request.args.get("order", Order.DESC.name)
-    page = request.args.get("page", "1")
+    cursor = request.args.get("cursor")
     per_page = request.args.get("per_page", "20")
 
     try:
-        pagination = managers_service.get_all_reports(order, page, per_page)
+        pagination = managers_service.get_all_reports(order, cursor, per_page)
         return render_template(
             "reports/unified_reports.html",
             pagination=pagination,
-            page=page,
+            order=order,
             per_page=per_page,
         )
     except BadRequestError as be:
@@ -0,0 +1,143 @@
+import hmac
+import jwt
+import requests
+from typing import Any
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+
+class OAuth2Error(Exception):
+    pass
+
+
+# a single pooled session per process: the token exchange & the jwks fetches of the
+# morning login burst reuse their (tls) connections rather than opening new ones
+http = requests.Session()
+http.headers["Accept"] = "application/json"
+for scheme in ("https://", "http://"):
+    http.mount(scheme, HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# a jwks client per provider, keyed by its jwks uri. each one caches the signing keys
+# & refetches them when a token names a kid it doesn't know (a key rotation)
+jwks_clients: dict[str, jwt.PyJWKClient] = {}
+JWKS_TTL = 3600
+# seconds of clock skew tolerated when checking `exp` & `iat`
+LEEWAY = 60
+
+
+def send(method: str, url: str, /, **kwargs) -> requests.Response:
+    """
+    Raises:
+        OAuth2Error
+    """
+    try:
+        response = http.request(
+            method, url, timeout=current_app.config["OAUTH2_TIMEOUT"], **kwargs
+        )
+    except requests.RequestException as e:
+        raise OAuth2Error(f"{method} {url} failed: {e}") from e
+
+    current_app.logger.debug(f"{method} {url} responded with {response.status_code}")
+    if response.status_code != 200:
+        raise OAuth2Error(f"{method} {url} responded with {response.status_code}")
+    return response
+
+
+def to_json(response: requests.Response, /) -> dict[str, Any]:
+    """
+    Raises:
+        OAuth2Error
+    """
+    try:
+        return response.json()
+    except ValueError as ve:
+        raise OAuth2Error(f"{response.url} responded with invalid json") from ve
+
+
+def exchange_code(
+    provider_data: dict[str, Any], code: str, redirect_uri: str, /
+) -> dict[str, Any]:
+    """
+    Raises:
+        OAuth2Error
+    """
+    token = to_json(
+        send(
+            "POST",
+            provider_data["token_url"],
+            data={
+                "client_id": provider_data["client_id"],
+                "client_secret": provider_data["client_secret"],
+                "code": code,
+                "grant_type": "authorization_code",
+                "redirect_uri": redirect_uri,
+            },
+        )
+    )
+    if not token.get("access_token"):
+        raise OAuth2Error("no access token in the token response")
+    return token
+
+
+def jwks_client(jwks_uri: str, /) -> jwt.PyJWKClient:
+    client = jwks_clients.get(jwks_uri)
+    if client is None:
+        client = jwks_clients[jwks_uri] = jwt.PyJWKClient(
+            jwks_uri,
+            lifespan=JWKS_TTL,
+            timeout=sum(current_app.config["OAUTH2_TIMEOUT"]),
+        )
+    return client
+
+
+def verify_id_token(
+    provider_data: dict[str, Any], id_token: str, nonce: str | None, /
+) -> dict[str, Any]:
+    """
+    Raises:
+        OAuth2Error
+    """
+    try:
+        key = jwks_client(provider_data["jwks_uri"]).get_signing_key_from_jwt(id_token)
+        claims = jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            audience=provider_data["client_id"],
+            issuer=provider_data["issuers"],
+            leeway=LEEWAY,
+            options={"require": ["exp", "iss", "aud"]},
+        )
+    except jwt.PyJWTError as e:
+        raise OAuth2Error(f"invalid id token: {e}") from e
+
+    if nonce is None or not hmac.compare_digest(str(claims.get("nonce")), nonce):
+        raise OAuth2Error("id token nonce mismatch")
+    return claims
+
+
+def get_email(
+    provider_data: dict[str, Any], token: dict[str, Any], nonce: str | None, /
+) -> str:
+    """
+    Raises:
+        OAuth2Error
+    """
+    # the verified id token already holds the email, so no userinfo round-trip is needed
+    if provider_data.get("jwks_uri") and token.get("id_token"):
+        claims = verify_id_token(provider_data, token["id_token"], nonce)
+        if claims.get("email_verified") is False:
+            raise OAuth2Error(f"unverified email {claims.get('email')}")
+    else:
+        claims = to_json(
+            send(
+                "GET",
+                provider_data["userinfo"]["url"],
+                headers={"Authorization": f"Bearer {token['access_token']}"},
+            )
+        )
+
+    try:
+        return provider_data["userinfo"]["email"](claims).lower()
+    except (KeyError, AttributeError) as e:
+        raise OAuth2Error("no email in the provider response") from e
@@ -141,18 +141,18 @@ def get_all_reports() -> str:
         )
 
     order = request.args.get("order", default=Order.DESC.name)
-    page = request.args.get("page", "1")
+    cursor = request.args.get("cursor")
     per_page = request.args.get("per_page", "20")
 
     try:
         pagination = users_service.get_all_reports(
-            current_user.company, order, page, per_page
+            current_user.company, order, cursor, per_page
         )
         return render_template(
             "reports/reports.html",
             current_company=current_user.company,
             pagination=pagination,
-            page=page,
+            order=order,
             per_page=per_page,
         )
     except BadRequestError as be:
@@ -0,0 +1,106 @@
+import datetime
+from collections import defaultdict
+from flask import current_app
+from onereport.dal import bitmap, dialect, report_dal, routing, summary_dal
+from onereport.data import db, misc, ArchivedReport, Report
+from onereport.data.archived_report import encode_presence, decode_presence
+from onereport.data.personnel_to_report import personnel_report_rel
+import sqlalchemy
+from sqlalchemy.exc import SQLAlchemyError
+
+# the presence of each of `reports` (rows of `report_dal.reports_statement`), read
+# within the write transaction
+def present_ids_by_report(reports: list[sqlalchemy.Row], /) -> dict[int, set[str]]:
+    presence = defaultdict(set)
+    for report_id, personnel_id in db.session.execute(
+        sqlalchemy.select(
+            personnel_report_rel.c.report_id, personnel_report_rel.c.personnel_id
+        )
+        .filter(personnel_report_rel.c.report_id.in_([report.id for report in reports]))
+        .filter(
+            personnel_report_rel.c.report_date.in_({report.date for report in reports})
+        )
+    ).all():
+        presence[report_id].add(personnel_id)
+
+    for report in reports:
+        presence[report.id] |= bitmap.to_ids(
+            misc.Company[report.company], bitmap.decode(report.presence_bitmap)
+        )
+    return presence
+
+
+# moves the reports dated before `before` into the archive, `batch_size` reports at a
+# time. each batch is archived & deleted in a single transaction, so a failure leaves
+# every report either hot or archived. their presence summaries are kept. returns the
+# number of archived reports or None on failure
+def archive(before: datetime.date, batch_size: int = 500, /) -> int | None:
+    archived = 0
+    try:
+        while reports := db.session.execute(
+            report_dal.reports_statement()
+            .add_columns(Report.last_edited, Report.edited_by_id)
+            .filter(Report.date < before)
+            .order_by(Report.id)
+            .limit(batch_size)
+        ).all():
+            presence = present_ids_by_report(reports)
+            db.session.execute(
+                dialect.insert(ArchivedReport.__table__).on_conflict_do_nothing(),
+                [
+                    {
+                        "id": report.id,
+                        "date": report.date,
+                        "company": report.company,
+                        "last_edited": report.last_edited,
+                        "edited_by_id": report.edited_by_id,
+                        "presence": encode_presence(presence[report.id]),
+                    }
+                    for report in reports
+                ],
+            )
+            archived += report_dal.delete_by_ids(
+                [report.id for report in reports], summaries=False
+            )
+            db.session.commit()
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return None
+    return archived
+
+
+# deletes `report` & its presence summary, kept when it was archived
+def delete(report: ArchivedReport, /) -> bool:
+    if report is None:
+        return False
+
+    try:
+        summary_dal.remove([(report.date, report.company)])
+        db.session.delete(report)
+        db.session.commit()
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return False
+    return True
+
+
+def find_report_by_id(id: int, /) -> ArchivedReport | None:
+    return db.session.scalar(
+        sqlalchemy.select(ArchivedReport).filter(ArchivedReport.id == id)
+    )
+
+
+def find_report_by_id_and_company(
+    id: int, company: misc.Company, /
+) -> ArchivedReport | None:
+    return routing.scalar(
+        sqlalchemy.select(ArchivedReport)
+        .filter(ArchivedReport.id == id)
+        .filter(ArchivedReport.company == company.name)
+    )
+
+
+def find_all_present_ids_by_report(report: ArchivedReport, /) -> set[str]:
+    return decode_presence(report.presence)
@@ -0,0 +1,154 @@
+import zlib
+from collections import defaultdict
+from typing import Iterable, Iterator
+from onereport.dal import dialect
+from onereport.data import db, misc, Report
+from onereport.data.personnel_ordinal import personnel_ordinal
+import sqlalchemy
+
+# a presence bitmap is a set of ordinals (see `personnel_ordinal`) held as the bits of
+# an int, so unions, intersections & counts over reports are bitwise operations. it's
+# stored as the zlib compressed little endian bytes of the int
+
+
+def encode(bits: int, /) -> bytes | None:
+    if not bits:
+        return None
+    return zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, "little"))
+
+
+def decode(data: bytes | None, /) -> int:
+    return 0 if data is None else int.from_bytes(zlib.decompress(data), "little")
+
+
+def from_ordinals(ordinals: Iterable[int], /) -> int:
+    ordinals = list(ordinals)
+    if not ordinals:
+        return 0
+
+    data = bytearray((max(ordinals) >> 3) + 1)
+    for ordinal in ordinals:
+        data[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(data, "little")
+
+
+def to_ordinals(bits: int, /) -> Iterator[int]:
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+# the ordinals which are set in at least `times` of `bitmaps`. the bitmaps are added
+# up by a bit sliced counter: `digits[k]` holds the k-th bit of the count of each
+# ordinal, which is then compared to `times` from the most significant bit down
+def at_least(bitmaps: Iterable[int], times: int, /) -> int:
+    digits, seen = [], 0
+    for bits in bitmaps:
+        seen |= bits
+        carry = bits
+        for k in range(len(digits)):
+            digits[k], carry = digits[k] ^ carry, digits[k] & carry
+            if not carry:
+                break
+        if carry:
+            digits.append(carry)
+
+    greater, equal = 0, seen
+    for k in reversed(range(max(len(digits), times.bit_length()))):
+        digit = digits[k] if k < len(digits) else 0
+        if times >> k & 1:
+            equal &= digit
+        else:
+            greater |= equal & digit
+            equal &= ~digit
+    return greater | equal
+
+
+# the ordinals of `ids` in `company`. the ones which have none are assigned the next
+# free ordinals. concurrent assignments can't clash, a taken ordinal is skipped and
+# retried. doesn't commit
+def ordinals(company: misc.Company, ids: set[str], /) -> dict[str, int]:
+    table = personnel_ordinal.c
+
+    def find(ids: Iterable[str]) -> dict[str, int]:
+        return dict(
+            db.session.execute(
+                sqlalchemy.select(table.personnel_id, table.ordinal)
+                .filter(table.company == company.name)
+                .filter(table.personnel_id.in_(ids))
+            ).all()
+        )
+
+    found = find(ids)
+    while missing := sorted(ids - found.keys()):
+        start = db.session.scalar(
+            sqlalchemy.select(
+                sqlalchemy.func.coalesce(sqlalchemy.func.max(table.ordinal) + 1, 0)
+            ).filter(table.company == company.name)
+        )
+        db.session.execute(
+            dialect.insert(personnel_ordinal).on_conflict_do_nothing(),
+            [
+                {"company": company.name, "ordinal": start + i, "personnel_id": id}
+                for i, id in enumerate(missing)
+            ],
+        )
+        found |= find(missing)
+    return found
+
+
+# the personnel ids of the ordinals set in `bits`
+def to_ids(company: misc.Company, bits: int, /) -> set[str]:
+    if not bits:
+        return set()
+
+    table = personnel_ordinal.c
+    return set(
+        db.session.scalars(
+            sqlalchemy.select(table.personnel_id)
+            .filter(table.company == company.name)
+            .filter(table.ordinal.in_(list(to_ordinals(bits))))
+        ).all()
+    )
+
+
+# clears the ordinals of `ids`, which are about to be deleted, from the presence
+# bitmaps of their companies & releases them, so no one who is later assigned one
+# of them (or re-added under one of `ids`) inherits the presence of the deleted
+# personnel. doesn't commit
+def release(ids: list[str], /) -> None:
+    table, report = personnel_ordinal.c, Report.__table__.c
+    masks = defaultdict(int)
+    for company, ordinal in db.session.execute(
+        sqlalchemy.select(table.company, table.ordinal).filter(
+            table.personnel_id.in_(ids)
+        )
+    ).all():
+        masks[company] |= 1 << ordinal
+    if not masks:
+        return
+
+    cleared = []
+    for company, mask in masks.items():
+        for id, date, presence_bitmap in db.session.execute(
+            sqlalchemy.select(report.id, report.date, report.presence_bitmap)
+            .filter(report.company == company)
+            .filter(report.presence_bitmap.is_not(None))
+        ).all():
+            bits = decode(presence_bitmap)
+            if bits & mask:
+                cleared.append(
+                    {"report_id": id, "report_date": date, "bits": encode(bits & ~mask)}
+                )
+    if cleared:
+        db.session.execute(
+            sqlalchemy.update(Report.__table__)
+            .where(report.id == sqlalchemy.bindparam("report_id"))
+            .where(report.date == sqlalchemy.bindparam("report_date"))
+            .values(presence_bitmap=sqlalchemy.bindparam("bits")),
+            cleared,
+        )
+    db.session.execute(
+        sqlalchemy.delete(personnel_ordinal).where(table.personnel_id.in_(ids))
+    )
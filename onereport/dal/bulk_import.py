@@ -0,0 +1,32 @@
+from itertools import islice
+from typing import Any, Iterable, Iterator, Self
+
+
+class ImportSummary:
+    """
+    the outcome of every row of a bulk import. rows are identified by their id, or by
+    their position in the import when they don't have one
+    """
+
+    def __init__(self: Self) -> None:
+        self.inserted: list[str] = []
+        self.updated: list[str] = []
+        self.rejected: list[tuple[str, str]] = []
+
+    def reject(self: Self, row: dict[str, Any], index: int, reason: str, /) -> None:
+        self.rejected.append((str(row.get("id") or f"#{index}"), reason))
+
+    def __repr__(self: Self) -> str:
+        return f"ImportSummary(inserted: {len(self.inserted)}, updated: {len(self.updated)}, rejected: {len(self.rejected)})"
+
+
+def chunked(
+    rows: Iterable[dict[str, Any]], size: int, /
+) -> Iterator[list[tuple[int, dict[str, Any]]]]:
+    iterator = enumerate(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def missing_fields(row: dict[str, Any], fields: tuple[str, ...], /) -> list[str]:
+    return [field for field in fields if not str(row.get(field) or "").strip()]
@@ -0,0 +1,20 @@
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+from onereport.data import db
+
+
+# an INSERT which supports ON CONFLICT for the dialect of the database in use
+def insert(table) -> postgresql.Insert | sqlite.Insert:
+    match db.engine.dialect.name:
+        case "postgresql":
+            return postgresql.insert(table)
+        case "sqlite":
+            return sqlite.insert(table)
+        case name:
+            raise sqlalchemy.exc.NoSuchModuleError(
+                f"ON CONFLICT isn't supported for the {name} dialect"
+            )
+
+
+def is_postgres() -> bool:
+    return db.engine.dialect.name == "postgresql"
@@ -0,0 +1,92 @@
+import datetime
+from onereport.dal import dialect
+from onereport.data import db, Personnel
+from onereport.data.personnel import service_period, service_end
+from onereport.data.personnel_history import personnel_history
+import sqlalchemy
+
+# the attributes of a personnel which are versioned
+TRACKED = ("first_name", "last_name", "company", "platoon")
+
+
+def of(personnel: Personnel, /) -> dict:
+    return {
+        "id": personnel.id,
+        "date_added": personnel.date_added,
+        **{field: getattr(personnel, field) for field in TRACKED},
+    }
+
+
+# records the attributes of `rows` (dicts holding `id` & `TRACKED`, e.g. the rows of
+# `personnel_dal.upsert`) as of today, closing the versions they replace. unchanged
+# rows are skipped & a personnel changed twice in a day keeps the latest version of
+# that day. doesn't commit
+def record(rows: list[dict], /) -> None:
+    today = datetime.date.today()
+    history = personnel_history.c
+    current = {
+        version.personnel_id: version
+        for version in db.session.execute(
+            sqlalchemy.select(personnel_history)
+            .filter(history.personnel_id.in_([row["id"] for row in rows]))
+            .filter(history.valid_to == None)  # noqa: E711
+        ).all()
+    }
+    changed = [
+        row
+        for row in rows
+        if row["id"] not in current
+        or any(getattr(current[row["id"]], field) != row[field] for field in TRACKED)
+    ]
+    if not changed:
+        return
+
+    ids = [row["id"] for row in changed]
+    db.session.execute(
+        sqlalchemy.delete(personnel_history)
+        .where(history.personnel_id.in_(ids))
+        .where(history.valid_from == today)
+    )
+    db.session.execute(
+        sqlalchemy.update(personnel_history)
+        .where(history.personnel_id.in_(ids))
+        .where(history.valid_to == None)  # noqa: E711
+        .values(valid_to=today - datetime.timedelta(days=1))
+    )
+    db.session.execute(
+        sqlalchemy.insert(personnel_history),
+        [
+            {
+                "personnel_id": row["id"],
+                **{field: row[field] for field in TRACKED},
+                # the first version of a personnel covers its whole service
+                "valid_from": today
+                if row["id"] in current
+                else min(row.get("date_added") or today, today),
+            }
+            for row in changed
+        ],
+    )
+
+
+# whether the version of a personnel held at `date`
+def valid_in(date: datetime.date, /) -> sqlalchemy.ColumnElement[bool]:
+    return sqlalchemy.and_(
+        personnel_history.c.valid_from <= date,
+        sqlalchemy.or_(
+            personnel_history.c.valid_to == None,  # noqa: E711
+            personnel_history.c.valid_to >= date,
+        ),
+    )
+
+
+# whether a personnel served at `date` (a date or a date column, e.g. of a report).
+# see `personnel.service_period`
+def active_in(
+    date: datetime.date | sqlalchemy.ColumnElement, /
+) -> sqlalchemy.ColumnElement[bool]:
+    if isinstance(date, datetime.date):
+        date = sqlalchemy.literal(date, sqlalchemy.Date)
+    if dialect.is_postgres():
+        return service_period().contains(date)
+    return sqlalchemy.and_(service_end() >= date, Personnel.date_added <= date)
@@ -0,0 +1,165 @@
+import json
+import base64
+import binascii
+import datetime
+import sqlalchemy
+from typing import Any, Self
+from onereport.dal import routing
+from onereport.dal.order_attr import Order
+
+NEXT = "n"
+PREV = "p"
+MAX_PER_PAGE = 100
+
+
+class Page:
+    def __init__(
+        self: Self,
+        items: list[Any],
+        next_cursor: str | None,
+        prev_cursor: str | None,
+        total: int | None = None,
+        /,
+    ) -> None:
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self: Self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self: Self) -> bool:
+        return self.prev_cursor is not None
+
+    def __repr__(self: Self) -> str:
+        return f"Page(items: {len(self.items)}, has next: {self.has_next}, has prev: {self.has_prev})"
+
+
+def to_json(value: Any, /) -> Any:
+    return value.isoformat() if isinstance(value, datetime.date) else value
+
+
+def from_json(value: Any, column: sqlalchemy.ColumnElement, /) -> Any:
+    python_type = column.type.python_type
+    if python_type is datetime.date:
+        return datetime.date.fromisoformat(value)
+    return python_type(value)
+
+
+# a cursor is opaque to its users. it holds the direction to page in and the key
+# of the row the page starts after
+def encode_cursor(direction: str, key: tuple, /) -> str:
+    payload = json.dumps([direction, *(to_json(value) for value in key)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, keys: list[sqlalchemy.ColumnElement], /
+) -> tuple[str, tuple]:
+    """
+    Raises:
+        ValueError
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, *key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"malformed cursor {cursor}") from e
+
+    if direction not in (NEXT, PREV) or len(key) != len(keys):
+        raise ValueError(f"malformed cursor {cursor}")
+
+    try:
+        return direction, tuple(
+            from_json(value, column) for value, column in zip(key, keys)
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"malformed cursor {cursor}") from e
+
+
+def is_valid_cursor(
+    cursor: str | None, keys: list[sqlalchemy.ColumnElement], /
+) -> bool:
+    if cursor is None:
+        return True
+
+    try:
+        decode_cursor(cursor, keys)
+    except ValueError:
+        return False
+    return True
+
+
+def is_valid_per_page(per_page: str, /) -> bool:
+    return per_page.isdecimal() and 1 <= int(per_page) <= MAX_PER_PAGE
+
+
+def key_of(item: Any, keys: list[sqlalchemy.ColumnElement], /) -> tuple:
+    return tuple(getattr(item, column.key) for column in keys)
+
+
+# seek (keyset) pagination. rather than skipping `OFFSET` rows, each page continues
+# right after (or before) the key of the last row seen, so every page costs the same
+# as the first one. `keys` must uniquely identify a row of `statement`
+def paginate(
+    statement: sqlalchemy.Select,
+    keys: list[sqlalchemy.ColumnElement],
+    order: Order,
+    cursor: str | None = None,
+    per_page: int = 20,
+    /,
+    count: bool = False,
+) -> Page:
+    """
+    Raises:
+        ValueError
+    """
+    direction, key = decode_cursor(cursor, keys) if cursor else (NEXT, None)
+
+    ascending = (order == Order.ASC) == (direction == NEXT)
+    seek = statement
+    if key is not None:
+        seek = seek.filter(
+            sqlalchemy.tuple_(*keys) > sqlalchemy.tuple_(*key)
+            if ascending
+            else sqlalchemy.tuple_(*keys) < sqlalchemy.tuple_(*key)
+        )
+    seek = seek.order_by(
+        *(column.asc() if ascending else column.desc() for column in keys)
+    ).limit(per_page + 1)
+
+    result = routing.execute(seek)
+    # a single entity (e.g. `select(Report)`) is returned as is, anything else as rows
+    descriptions = seek.column_descriptions
+    items = (
+        list(result.scalars().all())
+        if len(descriptions) == 1
+        and descriptions[0]["expr"] is descriptions[0]["entity"]
+        else list(result.all())
+    )
+
+    more = len(items) > per_page
+    items = items[:per_page]
+    if direction == PREV:
+        items.reverse()
+
+    has_next = more if direction == NEXT else key is not None
+    has_prev = key is not None if direction == NEXT else more
+
+    total = None
+    if count:
+        total = routing.scalar(
+            sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                statement.order_by(None).subquery()
+            )
+        )
+
+    return Page(
+        items,
+        encode_cursor(NEXT, key_of(items[-1], keys)) if has_next and items else None,
+        encode_cursor(PREV, key_of(items[0], keys)) if has_prev and items else None,
+        total,
+    )
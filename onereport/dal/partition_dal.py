@@ -0,0 +1,118 @@
+import datetime
+from typing import Callable, Iterable, TypeVar
+from flask import current_app
+from onereport.dal import dialect
+from onereport.data import db, partitions, Report
+from onereport.data.personnel_to_report import personnel_report_rel
+import sqlalchemy
+from sqlalchemy.exc import SQLAlchemyError
+
+
+# creates the partitions of the month of `date` unless they exist, so reports of that
+# date can be written. a no-op on sqlite. doesn't commit
+def ensure(date: datetime.date, /) -> None:
+    if not dialect.is_postgres():
+        return
+
+    month = partitions.month_of(date)
+    if not partitions.exists(db.session, month):
+        partitions.create(db.session, month)
+
+
+T = TypeVar("T")
+
+
+# whether `error` is postgres refusing a row for which no partition exists (a check
+# violation of the partitioned table)
+def is_missing(error: SQLAlchemyError, /) -> bool:
+    orig = getattr(error, "orig", None)
+    return getattr(orig, "sqlstate", getattr(orig, "pgcode", None)) == "23514"
+
+
+# runs `transaction`, which writes reports of `dates` & commits. the partitions of a
+# month are created ahead of time (see `prepare`), so a write only misses them if
+# `rotate_partitions` didn't run. the transaction is then rolled back, the missing
+# partitions are created in a transaction of their own & it's retried. raises what
+# `transaction` raises
+def write(dates: Iterable[datetime.date], transaction: Callable[[], T], /) -> T:
+    try:
+        return transaction()
+    except SQLAlchemyError as se:
+        if not is_missing(se):
+            raise
+        db.session.rollback()
+
+    for month in sorted({partitions.month_of(date) for date in dates}):
+        current_app.logger.warning(f"creating the missing partitions of {month:%Y-%m}")
+        partitions.create(db.session, month)
+    db.session.commit()
+    return transaction()
+
+
+# creates the partitions of this month & the next `ahead` months, so the first
+# submission of a month doesn't have to. returns False on failure
+def prepare(today: datetime.date, ahead: int = 1, /) -> bool:
+    month = partitions.month_of(today)
+    try:
+        for _ in range(ahead + 1):
+            ensure(month)
+            month = partitions.next_month(month)
+        db.session.commit()
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return False
+    return True
+
+
+# retires the reports (and their presence) of the months before `before`. on postgres
+# their partitions are detached, which takes the same time however many reports they
+# hold, and left as standalone tables to archive or dropped if `drop`. sqlite has no
+# partitions, there they're deleted by date range, so it refuses unless `delete` (the
+# reports archived beforehand aren't there to delete). their presence summaries are
+# kept. returns the retired months or None on failure
+def retire(
+    before: datetime.date, /, drop: bool = False, delete: bool = False
+) -> list[datetime.date] | None:
+    before = partitions.month_of(before)
+    try:
+        if dialect.is_postgres():
+            retired = [
+                month for month in partitions.months(db.session) if month < before
+            ]
+            for month in retired:
+                partitions.detach(db.session, month, drop=drop)
+        else:
+            retired = sorted(
+                {
+                    partitions.month_of(date)
+                    for date in db.session.scalars(
+                        sqlalchemy.select(Report.date)
+                        .filter(Report.date < before)
+                        .distinct()
+                    ).all()
+                }
+            )
+            if retired and not delete:
+                current_app.logger.error(
+                    f"refusing to delete the reports dated before {before} on sqlite,"
+                    " archive them first"
+                )
+                return None
+
+            db.session.execute(
+                sqlalchemy.delete(personnel_report_rel).where(
+                    personnel_report_rel.c.report_date < before
+                )
+            )
+            db.session.execute(
+                sqlalchemy.delete(Report.__table__).where(
+                    Report.__table__.c.date < before
+                )
+            )
+        db.session.commit()
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return None
+    return retired
@@ -1,9 +1,25 @@
 import datetime
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 from flask import current_app
-from onereport.dal import PersonnelOrderBy, Order
-from onereport.data import db, Personnel, User
+from onereport.dal import (
+    PersonnelOrderBy,
+    UserOrderBy,
+    Order,
+    bitmap,
+    bulk_import,
+    dialect,
+    history,
+    roster_snapshot,
+    routing,
+    summary_dal,
+    versions,
+)
+from onereport.data import db, Personnel, User, Report
 from onereport.data import misc
+from onereport.data.cache import user_cache, roster_cache
+from onereport.data.coded import Coded
+from onereport.data.personnel_history import personnel_history
+from onereport.data.personnel_to_report import personnel_report_rel
 import sqlalchemy
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -14,6 +30,9 @@ def save(personnel: Personnel, /) -> bool:
 
     try:
         db.session.add(personnel)
+        history.record([history.of(personnel)])
+        summary_dal.recount_changed(personnel.date_added)
+        versions.bump(versions.ROSTER)
         db.session.commit()
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
@@ -27,8 +46,16 @@ def update(original: Personnel, new: Personnel, /) -> bool:
         return False
 
     try:
+        email = original.email if isinstance(original, User) else None
+        removed = original.date_removed
         original.update_personnel(new)
+        history.record([history.of(original)])
+        summary_dal.recount_changed(removed, original.date_removed)
+        versions.bump(versions.ROSTER)
+        if email is not None:
+            versions.bump(versions.USERS)
         db.session.commit()
+        user_cache.invalidate(email)
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
@@ -36,18 +63,112 @@ def update(original: Personnel, new: Personnel, /) -> bool:
     return True
 
 
-def save_all(personnel: list[Personnel], /) -> bool:
-    if personnel is None or not personnel:
-        return False
+PERSONNEL_FIELDS = ("id", "first_name", "last_name", "company", "platoon")
+
+
+# returns the reason a row of a bulk import is invalid, None if it's valid
+def validate_row(row: dict[str, str], /) -> str | None:
+    missing = bulk_import.missing_fields(row, PERSONNEL_FIELDS)
+    if missing:
+        return f"missing {', '.join(missing)}"
+    if not misc.Company.is_valid(row["company"]):
+        return f"invalid company {row['company']}"
+    if not misc.Platoon.is_valid(row["platoon"]):
+        return f"invalid platoon {row['platoon']}"
+    return None
+
+
+def to_table_row(row: dict[str, str], type: str = "personnel", /) -> dict:
+    return {
+        "id": str(row["id"]).strip(),
+        "first_name": row["first_name"].strip(),
+        "last_name": row["last_name"].strip(),
+        "company": row["company"],
+        "platoon": row["platoon"],
+        "active": True,
+        "date_added": datetime.date.today(),
+        "date_removed": None,
+        "type": type,
+    }
+
+
+# INSERT ... ON CONFLICT (id) DO UPDATE for all of `rows` in a single executemany.
+# an imported personnel is (re)activated. its type is only overwritten when
+# `update_type` is set (i.e. when importing users). doesn't commit
+def upsert(rows: list[dict], update_type: bool = False, /) -> None:
+    history.record(rows)
+    versions.bump(versions.ROSTER)
+    table = Personnel.__table__
+    # the earliest removal the import undoes
+    removed = db.session.scalar(
+        sqlalchemy.select(sqlalchemy.func.min(table.c.date_removed)).filter(
+            table.c.id.in_([row["id"] for row in rows])
+        )
+    )
+    statement = dialect.insert(table)
+    columns = ["first_name", "last_name", "company", "platoon", "active", "date_removed"]
+    if update_type:
+        columns.append("type")
+
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={column: statement.excluded[column] for column in columns},
+        ),
+        rows,
+    )
+    summary_dal.recount_changed(removed)
+
+
+# streams `rows` (dicts shaped like `PERSONNEL_FIELDS`) into the db `chunk_size` rows
+# at a time. each chunk is a single upsert & commit, so an invalid row or a failing
+# chunk doesn't roll back the rest of the import
+def save_all(
+    rows: Iterable[dict[str, str]], chunk_size: int = 500, /
+) -> bulk_import.ImportSummary:
+    summary = bulk_import.ImportSummary()
+    if rows is None:
+        return summary
+
+    seen = set()
+    for chunk in bulk_import.chunked(rows, chunk_size):
+        valid = []
+        for index, row in chunk:
+            reason = validate_row(row)
+            if reason is None and str(row["id"]).strip() in seen:
+                reason = "duplicate id"
+            if reason is not None:
+                summary.reject(row, index, reason)
+                continue
+
+            valid.append(to_table_row(row))
+            seen.add(valid[-1]["id"])
+
+        if not valid:
+            continue
+
+        ids = [row["id"] for row in valid]
+        try:
+            existing = set(
+                db.session.scalars(
+                    sqlalchemy.select(Personnel.id).filter(Personnel.id.in_(ids))
+                ).all()
+            )
+            upsert(valid)
+            # an imported id might belong to a user
+            versions.bump(versions.USERS)
+            db.session.commit()
+            user_cache.clear()
+        except SQLAlchemyError as se:
+            current_app.logger.error(f"{se}")
+            db.session.rollback()
+            summary.rejected.extend((id, "database error") for id in ids)
+            continue
 
-    try:
-        db.session.add_all(personnel)
-        db.session.commit()
-    except SQLAlchemyError as se:
-        current_app.logger.error(f"{se}")
-        db.session.rollback()
-        return False
-    return True
+        summary.inserted.extend(id for id in ids if id not in existing)
+        summary.updated.extend(id for id in ids if id in existing)
+
+    return summary
 
 
 def delete(personnel: Personnel, /) -> bool:
@@ -55,8 +176,25 @@ def delete(personnel: Personnel, /) -> bool:
         return False
 
     try:
+        email = personnel.email if isinstance(personnel, User) else None
+        db.session.execute(
+            sqlalchemy.update(Report.__table__)
+            .where(Report.__table__.c.edited_by_id == personnel.id)
+            .values(edited_by_id=None)
+        )
+        db.session.execute(
+            sqlalchemy.delete(personnel_report_rel).where(
+                personnel_report_rel.c.personnel_id == personnel.id
+            )
+        )
+        bitmap.release([personnel.id])
         db.session.delete(personnel)
+        summary_dal.recount_changed(personnel.date_added)
+        versions.bump(versions.ROSTER)
+        if email is not None:
+            versions.bump(versions.USERS)
         db.session.commit()
+        user_cache.invalidate(email)
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
@@ -64,23 +202,65 @@ def delete(personnel: Personnel, /) -> bool:
     return True
 
 
-def delete_all(personnel: list[Personnel], /) -> bool:
-    if personnel is None or not personnel:
-        return False
-
+# deletes the personnel of `ids` (users included) alongside their presence. reports
+# they've edited are kept but no longer point at them. doesn't commit
+def delete_by_ids(ids: list[str], /) -> int:
+    versions.bump(versions.ROSTER)
+    db.session.execute(
+        sqlalchemy.update(Report.__table__)
+        .where(Report.__table__.c.edited_by_id.in_(ids))
+        .values(edited_by_id=None)
+    )
+    db.session.execute(
+        sqlalchemy.delete(personnel_report_rel).where(
+            personnel_report_rel.c.personnel_id.in_(ids)
+        )
+    )
+    bitmap.release(ids)
+    db.session.execute(
+        sqlalchemy.delete(User.__table__).where(User.__table__.c.id.in_(ids))
+    )
+    return db.session.execute(
+        sqlalchemy.delete(Personnel.__table__).where(
+            Personnel.__table__.c.id.in_(ids)
+        )
+    ).rowcount
+
+
+# deletes every row of `column`'s table but the ones in `excluded`, `batch_size` at
+# a time. doesn't commit
+def delete_batches(
+    column: sqlalchemy.Column, excluded: set[str], batch_size: int, /
+) -> int:
+    deleted = 0
+    while ids := db.session.scalars(
+        sqlalchemy.select(column)
+        .filter(column.not_in(excluded))
+        .order_by(column)
+        .limit(batch_size)
+    ).all():
+        deleted += delete_by_ids(ids)
+    return deleted
+
+
+# deletes every user and then every other personnel but the ones in `excluded`,
+# `batch_size` at a time, in a single transaction. returns the number of deleted
+# users & personnel or None on failure
+def delete_all(
+    excluded: set[str] = frozenset(), batch_size: int = 1000, /
+) -> tuple[int, int] | None:
     try:
-        for p in personnel:
-            try:
-                db.session.delete(p)
-            except SQLAlchemyError as se:
-                current_app.logger.error(f"{se}")
-                db.session.rollback()
+        users = delete_batches(User.__table__.c.id, excluded, batch_size)
+        personnel = delete_batches(Personnel.id, excluded, batch_size)
+        summary_dal.recount(None)
+        versions.bump(versions.USERS)
         db.session.commit()
+        user_cache.clear()
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
-        return False
-    return True
+        return None
+    return users, personnel
 
 
 def find_personnel_by_id(id: str, /) -> Personnel | None:
@@ -105,24 +285,71 @@ def find_personnel_by_last_name(last_name: str, /) -> Personnel | None:
     )
 
 
+# the columns a roster displays. selecting them rather than `Personnel` skips the
+# identity map & the instance state of every row, and the polymorphic load of users
+ROW_COLUMNS = (
+    Personnel.id,
+    Personnel.first_name,
+    Personnel.last_name,
+    Personnel.company,
+    Personnel.platoon,
+    Personnel.active,
+)
+
+
+# the column of `entity` which `order_by` sorts by. a coded column sorts by its names,
+# as the roster snapshot does (see `roster_snapshot.SORT_KEYS`)
+def sort_column(
+    entity: type[Personnel], order_by: PersonnelOrderBy | UserOrderBy, /
+) -> sqlalchemy.ColumnElement:
+    column = getattr(entity, order_by.name.lower())
+    return column.type.by_name(column) if isinstance(column.type, Coded) else column
+
+
 def construct_statement(
-    order_by: PersonnelOrderBy, order: Order, /
+    order_by: PersonnelOrderBy, order: Order, /, rows: bool = False
 ) -> sqlalchemy.Select[Tuple]:
+    statement = (
+        sqlalchemy.select(*ROW_COLUMNS) if rows else sqlalchemy.select(Personnel)
+    )
+    column = sort_column(Personnel, order_by)
     return (
-        sqlalchemy.select(Personnel).order_by(
-            sqlalchemy.asc(order_by.name.lower())
-        )
+        statement.order_by(sqlalchemy.asc(column))
         if order == Order.ASC
-        else sqlalchemy.select(Personnel).order_by(
-            sqlalchemy.desc(order_by.name.lower())
-        )
+        else statement.order_by(sqlalchemy.desc(column))
+    )
+
+
+# roster reads go through the replica, if there is one
+def fetch(statement: sqlalchemy.Select, rows: bool, /) -> list:
+    return (
+        routing.execute(statement).all() if rows else routing.scalars(statement).all()
     )
 
 
+# rows of a company roster, sorted as the snapshot sorts them & served from
+# `roster_cache` while the roster version is unchanged. it backs the snapshot, when
+# that is disabled or can't be used. entities are bound to a session, so only rows
+# are cached
+def fetch_roster(
+    statement: sqlalchemy.Select,
+    order_by: PersonnelOrderBy,
+    order: Order,
+    key: tuple,
+    /,
+) -> list[sqlalchemy.Row]:
+    key = (*key, order_by.name, order.name, versions.current(versions.ROSTER))
+    roster = roster_cache.get(key)
+    if roster is None:
+        roster = tuple(roster_snapshot.sort(fetch(statement, True), order_by, order))
+        roster_cache.put(key, roster, current_app.config.get("ROSTER_CACHE_TTL", 300))
+    return list(roster)
+
+
 def find_all_active_personnel(
     order_by: PersonnelOrderBy, order: Order, /
 ) -> List[Personnel]:
-    return db.session.scalars(
+    return routing.scalars(
         construct_statement(order_by, order).filter(Personnel.active)
     ).all()
 
@@ -132,18 +359,25 @@ def find_all_active_personnel_by_company(
     order_by: PersonnelOrderBy,
     order: Order,
     /,
-) -> List[Personnel]:
-    return db.session.scalars(
-        construct_statement(order_by, order)
+    rows: bool = False,
+) -> List[Personnel] | list[sqlalchemy.Row]:
+    if rows and (snapshot := roster_snapshot.current()) is not None:
+        return snapshot.roster(company, order_by, order, active_only=True)
+
+    statement = (
+        construct_statement(order_by, order, rows=rows)
         .filter(Personnel.active)
         .filter(Personnel.company == company.name)
-    ).all()
+    )
+    if rows:
+        return fetch_roster(statement, order_by, order, ("active", company.name))
+    return fetch(statement, rows)
 
 
 def find_all_personnel(
     order_by: PersonnelOrderBy, order: Order, /
 ) -> List[Personnel]:
-    return db.session.scalars(construct_statement(order_by, order)).all()
+    return routing.scalars(construct_statement(order_by, order)).all()
 
 
 def find_all_personnel_by_company(
@@ -151,10 +385,17 @@ def find_all_personnel_by_company(
     order_by: PersonnelOrderBy,
     order: Order,
     /,
-) -> List[Personnel]:
-    return db.session.scalars(
-        construct_statement(order_by, order).filter(User.company == company.name)
-    ).all()
+    rows: bool = False,
+) -> List[Personnel] | list[sqlalchemy.Row]:
+    if rows and (snapshot := roster_snapshot.current()) is not None:
+        return snapshot.roster(company, order_by, order)
+
+    statement = construct_statement(order_by, order, rows=rows).filter(
+        Personnel.company == company.name
+    )
+    if rows:
+        return fetch_roster(statement, order_by, order, ("all", company.name))
+    return fetch(statement, rows)
 
 
 def find_all_personnel_by_company_dated_before(
@@ -164,7 +405,7 @@ def find_all_personnel_by_company_dated_before(
     order: Order,
     /,
 ) -> list[Personnel]:
-    return db.session.scalars(
+    return routing.scalars(
         construct_statement(order_by, order)
         .filter(Personnel.company == company.name)
         .filter(Personnel.date_added <= date)
@@ -177,24 +418,25 @@ def find_all_personnel_by_company_active_in(
     order_by: PersonnelOrderBy,
     order: Order,
     /,
-) -> list[Personnel]:
-    return db.session.scalars(
-        construct_statement(order_by, order)
+    rows: bool = False,
+) -> list[Personnel] | list[sqlalchemy.Row]:
+    if rows and (snapshot := roster_snapshot.current()) is not None:
+        return snapshot.roster(company, order_by, order, date=date)
+
+    statement = (
+        construct_statement(order_by, order, rows=rows)
         .filter(Personnel.company == company.name)
-        .filter(Personnel.date_added <= date)
-        .filter(
-            sqlalchemy.or_(
-                Personnel.date_removed == None,  # noqa: E711
-                Personnel.date_removed >= date,
-            )
-        )
-    ).all()
+        .filter(history.active_in(date))
+    )
+    if rows:
+        return fetch_roster(statement, order_by, order, (date, company.name))
+    return fetch(statement, rows)
 
 
 def find_all_personnel_dated_before(
     date: datetime.date, order_by: PersonnelOrderBy, order: Order, /
 ) -> list[Personnel]:
-    return db.session.scalars(
+    return routing.scalars(
         construct_statement(order_by, order).filter(Personnel.date_added <= date)
     ).all()
 
@@ -205,13 +447,65 @@ def find_all_personnel_active_in(
     order: Order,
     /,
 ) -> list[Personnel]:
-    return db.session.scalars(
+    return routing.scalars(
         construct_statement(order_by, order)
-        .filter(Personnel.date_added <= date)
-        .filter(
-            sqlalchemy.or_(
-                Personnel.date_removed == None,  # noqa: E711
-                Personnel.date_removed >= date,
-            )
+        .filter(history.active_in(date))
+    ).all()
+
+
+# the roster of `date` as it was at `date`: the personnel who served at `date` with
+# the names, company & platoon they had then. rows are shaped like `ROW_COLUMNS`
+def as_of_statement(
+    date: datetime.date, order_by: PersonnelOrderBy, order: Order, /
+) -> sqlalchemy.Select[Tuple]:
+    columns = personnel_history.c
+    column = (
+        columns.personnel_id
+        if order_by == PersonnelOrderBy.ID
+        else columns[order_by.name.lower()]
+    )
+    statement = (
+        sqlalchemy.select(
+            columns.personnel_id.label("id"),
+            columns.first_name,
+            columns.last_name,
+            columns.company,
+            columns.platoon,
+            Personnel.active,
+        )
+        .join(Personnel, Personnel.id == columns.personnel_id)
+        .filter(history.valid_in(date))
+        .filter(history.active_in(date))
+    )
+    return statement.order_by(
+        sqlalchemy.asc(column) if order == Order.ASC else sqlalchemy.desc(column)
+    )
+
+
+def find_all_personnel_by_company_as_of(
+    company: misc.Company,
+    date: datetime.date,
+    order_by: PersonnelOrderBy,
+    order: Order,
+    /,
+) -> list[sqlalchemy.Row]:
+    # nothing has changed since today
+    if date >= datetime.date.today():
+        return find_all_personnel_by_company_active_in(
+            company, date, order_by, order, rows=True
+        )
+
+    rows = routing.execute(
+        as_of_statement(date, order_by, order).filter(
+            personnel_history.c.company == company.name
         )
     ).all()
+    return roster_snapshot.sort(rows, order_by, order)
+
+
+# the whole roster of `date` as it was at `date`. rows are shaped like `ROW_COLUMNS`
+def find_all_personnel_as_of(
+    date: datetime.date, order_by: PersonnelOrderBy, order: Order, /
+) -> list[sqlalchemy.Row]:
+    rows = routing.execute(as_of_statement(date, order_by, order)).all()
+    return roster_snapshot.sort(rows, order_by, order)
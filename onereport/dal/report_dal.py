@@ -1,7 +1,18 @@
-from flask_sqlalchemy.pagination import Pagination
+from collections import Counter
 from flask import current_app
-from onereport.dal import Order
-from onereport.data import db, misc, Report, Personnel, User
+from onereport.dal import (
+    Order,
+    bitmap,
+    dialect,
+    keyset,
+    partition_dal,
+    routing,
+    summary_dal,
+)
+from onereport.data import db, misc, ArchivedReport, Report, User
+from onereport.data.archived_report import decode_presence
+from onereport.data.personnel_to_report import personnel_report_rel
+from onereport.data.presence_summary import presence_summary
 import sqlalchemy
 from sqlalchemy.exc import SQLAlchemyError
 import datetime
@@ -11,9 +22,13 @@ def save(report: Report, /) -> bool:
     if report is None:
         return False
 
-    try:
+    def add() -> None:
         db.session.add(report)
         db.session.commit()
+
+    try:
+        # the date defaults to today once inserted
+        partition_dal.write([report.date or datetime.date.today()], add)
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
@@ -21,12 +36,62 @@ def save(report: Report, /) -> bool:
     return True
 
 
-def update(report: Report, presence: set[Personnel], user: User=None, /) -> bool:
-    if report is None:
+# whether presence is written as bitmaps rather than association table rows
+def bitmap_storage() -> bool:
+    return current_app.config.get("PRESENCE_STORAGE") == "bitmap"
+
+
+# writes `presence` (a set of personnel ids) in the configured storage, moving the
+# report out of the other one, recounts its presence summary & marks the report
+# submitted. in the association table only the difference is written. doesn't
+# commit. returns the added & removed ids
+def update_presence(
+    report: Report, presence: set[str], /
+) -> tuple[set[str], set[str]]:
+    report_id, company = report.id, misc.Company[report.company]
+    report.submitted = True
+    # read within the write transaction, i.e. from the primary
+    stored = set(db.session.scalars(present_ids_statement(report)).all())
+    previous = stored | bitmap.to_ids(company, bitmap.decode(report.presence_bitmap))
+
+    if bitmap_storage():
+        rows_removed, rows_added = stored, set()
+        report.presence_bitmap = bitmap.encode(
+            bitmap.from_ordinals(bitmap.ordinals(company, presence).values())
+        )
+    else:
+        rows_removed, rows_added = stored - presence, presence - stored
+        report.presence_bitmap = None
+
+    if rows_removed:
+        db.session.execute(
+            sqlalchemy.delete(personnel_report_rel)
+            .where(personnel_report_rel.c.report_id == report_id)
+            .where(personnel_report_rel.c.report_date == report.date)
+            .where(personnel_report_rel.c.personnel_id.in_(rows_removed))
+        )
+
+    if rows_added:
+        db.session.execute(
+            sqlalchemy.insert(personnel_report_rel),
+            [
+                {"report_id": report_id, "personnel_id": id, "report_date": report.date}
+                for id in rows_added
+            ],
+        )
+
+    added, removed = presence - previous, previous - presence
+    summary_dal.recount(report.date, report.date, company)
+    return added, removed
+
+
+def update(report: Report, presence: set[str], user: User = None, /) -> bool:
+    if report is None or presence is None:
         return False
 
     try:
-        report.update(presence, user)
+        report.touch(user)
+        update_presence(report, presence)
         db.session.commit()
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
@@ -39,9 +104,14 @@ def save_all(reports: list[Report], /) -> bool:
     if reports is None or not reports:
         return False
 
-    try:
+    def add_all() -> None:
         db.session.add_all(reports)
         db.session.commit()
+
+    try:
+        partition_dal.write(
+            [report.date or datetime.date.today() for report in reports], add_all
+        )
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
@@ -54,6 +124,12 @@ def delete(report: Report, /) -> bool:
         return False
 
     try:
+        summary_dal.remove([(report.date, report.company)])
+        db.session.execute(
+            sqlalchemy.delete(personnel_report_rel)
+            .where(personnel_report_rel.c.report_id == report.id)
+            .where(personnel_report_rel.c.report_date == report.date)
+        )
         db.session.delete(report)
         db.session.commit()
     except SQLAlchemyError as se:
@@ -63,23 +139,95 @@ def delete(report: Report, /) -> bool:
     return True
 
 
-def delete_all(reports: list[Report], /) -> bool:
-    if reports is None or not reports:
-        return False
+# deletes the reports of `ids` alongside their presence & (unless archived, i.e. not
+# `summaries`) their summaries. doesn't commit
+def delete_by_ids(ids: list[int], /, summaries: bool = True) -> int:
+    if summaries:
+        summary_dal.remove(
+            db.session.execute(
+                sqlalchemy.select(Report.date, Report.company).filter(
+                    Report.id.in_(ids)
+                )
+            ).all()
+        )
+    db.session.execute(
+        sqlalchemy.delete(personnel_report_rel).where(
+            personnel_report_rel.c.report_id.in_(ids)
+        )
+    )
+    return db.session.execute(
+        sqlalchemy.delete(Report.__table__).where(Report.__table__.c.id.in_(ids))
+    ).rowcount
+
 
+# deletes every report, `batch_size` hot reports at a time, and the archive, in a
+# single transaction. returns the number of deleted reports or None on failure
+def delete_all(batch_size: int = 1000, /) -> int | None:
+    deleted = 0
     try:
-        for report in reports:
-            try:
-                db.session.delete(report)
-            except SQLAlchemyError as se:
-                current_app.logger.error(f"{se}")
-                db.session.rollback()
+        while ids := db.session.scalars(
+            sqlalchemy.select(Report.id).order_by(Report.id).limit(batch_size)
+        ).all():
+            deleted += delete_by_ids(ids)
+        deleted += db.session.execute(
+            sqlalchemy.delete(ArchivedReport.__table__)
+        ).rowcount
+        # the summaries of the archived reports, no report is left to summarize
+        db.session.execute(sqlalchemy.delete(presence_summary))
         db.session.commit()
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
-        return False
-    return True
+        return None
+    return deleted
+
+
+# an atomic get-or-create. relies on `ux_report_date_company` so two concurrent
+# callers can't both create a report for the same company & day. doesn't commit
+def get_or_create(
+    date: datetime.date, company: misc.Company, user: User = None, /
+) -> Report:
+    report = db.session.scalar(
+        dialect.insert(Report)
+        .values(
+            date=date,
+            company=company.name,
+            edited_by_id=user.id if user else None,
+            last_edited=datetime.datetime.now(),
+        )
+        .on_conflict_do_nothing(index_elements=[Report.date, Report.company])
+        .returning(Report)
+    )
+
+    # someone else created the report first
+    if report is None:
+        report = find_report_by_date_and_company(date, company)
+    return report
+
+
+# the daily submission: creates the report of `company` at `date` unless it already
+# exists & writes its presence, all in a single transaction. a report therefore
+# exists only once someone has submitted it
+def submit(
+    date: datetime.date, company: misc.Company, presence: set[str], user: User = None, /
+) -> Report | None:
+    if presence is None:
+        return None
+
+    def write() -> Report:
+        report = get_or_create(date, company, user)
+        report.touch(user)
+        update_presence(report, presence)
+        db.session.commit()
+        return report
+
+    try:
+        report = partition_dal.write([date], write)
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return None
+    return report
 
 
 def find_report_by_id(id: int, /) -> Report | None:
@@ -88,11 +236,173 @@ def find_report_by_id(id: int, /) -> Report | None:
     )
 
 
+# the presence of `report` in the association table. the date keeps the lookup to the
+# partition of its month
+def present_ids_statement(report: Report, /) -> sqlalchemy.Select:
+    return (
+        sqlalchemy.select(personnel_report_rel.c.personnel_id)
+        .filter(personnel_report_rel.c.report_id == report.id)
+        .filter(personnel_report_rel.c.report_date == report.date)
+    )
+
+
+# the presence of reports, whichever storage holds it, from rows of
+# `reports_statement`
+def present_ids(reports: list[sqlalchemy.Row], /) -> set[str]:
+    if not reports:
+        return set()
+
+    ids = set(
+        routing.scalars(
+            sqlalchemy.select(personnel_report_rel.c.personnel_id)
+            .filter(
+                personnel_report_rel.c.report_id.in_([report.id for report in reports])
+            )
+            .filter(
+                personnel_report_rel.c.report_date.in_(
+                    {report.date for report in reports}
+                )
+            )
+        ).all()
+    )
+    for report in reports:
+        ids |= bitmap.to_ids(
+            misc.Company[report.company], bitmap.decode(report.presence_bitmap)
+        )
+    return ids
+
+
+# the presence of each of the archived reports matching `conditions`. the reports of
+# closed months are moved to the archive (see `archive_dal.archive`), so the readers
+# of presence by date add them to the hot ones
+def archived_present_ids(*conditions: sqlalchemy.ColumnElement[bool]) -> list[set[str]]:
+    return [
+        decode_presence(presence)
+        for presence in routing.scalars(
+            sqlalchemy.select(ArchivedReport.presence).filter(*conditions)
+        ).all()
+    ]
+
+
+def reports_statement() -> sqlalchemy.Select:
+    return sqlalchemy.select(
+        Report.id, Report.date, Report.company, Report.presence_bitmap
+    )
+
+
+def find_all_present_ids_by_report(report_id: int, /) -> set[str]:
+    return present_ids(
+        routing.execute(reports_statement().filter(Report.id == report_id)).all()
+    )
+
+
+# the presence of the report of `company` at `date`. empty if it wasn't submitted yet
+def find_all_present_ids_by_date_and_company(
+    date: datetime.date, company: misc.Company, /
+) -> set[str]:
+    return present_ids(
+        routing.execute(
+            reports_statement()
+            .filter(Report.date == date)
+            .filter(Report.company == company.name)
+        ).all()
+    ).union(
+        *archived_present_ids(
+            ArchivedReport.date == date, ArchivedReport.company == company.name
+        )
+    )
+
+
+# the presence across the reports of every company at `date`, archived ones included
+def find_all_present_ids_by_date(date: datetime.date, /) -> set[str]:
+    return present_ids(
+        routing.execute(reports_statement().filter(Report.date == date)).all()
+    ).union(*archived_present_ids(ArchivedReport.date == date))
+
+
+# the personnel of `company` present in at least `times` of its reports between
+# `start` & `end` (inclusive), archived ones included. when all of them are bitmaps
+# it's bitwise, otherwise the presence is counted per personnel
+def find_all_ids_present_at_least(
+    company: misc.Company,
+    times: int,
+    start: datetime.date,
+    end: datetime.date,
+    /,
+) -> set[str]:
+    reports = routing.execute(
+        reports_statement()
+        .filter(Report.company == company.name)
+        .filter(Report.date >= start)
+        .filter(Report.date <= end)
+    ).all()
+    bitmaps = [
+        bitmap.decode(report.presence_bitmap)
+        for report in reports
+        if report.presence_bitmap is not None
+    ]
+    table_ids = [report.id for report in reports if report.presence_bitmap is None]
+    archived = archived_present_ids(
+        ArchivedReport.company == company.name,
+        ArchivedReport.date >= start,
+        ArchivedReport.date <= end,
+    )
+    if not table_ids and not archived:
+        return bitmap.to_ids(company, bitmap.at_least(bitmaps, times))
+
+    counts = Counter()
+    if table_ids:
+        counts.update(
+            dict(
+                routing.execute(
+                    sqlalchemy.select(
+                        personnel_report_rel.c.personnel_id, sqlalchemy.func.count()
+                    )
+                    .filter(personnel_report_rel.c.report_id.in_(table_ids))
+                    .filter(personnel_report_rel.c.report_date >= start)
+                    .filter(personnel_report_rel.c.report_date <= end)
+                    .group_by(personnel_report_rel.c.personnel_id)
+                ).all()
+            )
+        )
+    for bits in bitmaps:
+        counts.update(bitmap.to_ids(company, bits))
+    for ids in archived:
+        counts.update(ids)
+    return {id for id, count in counts.items() if count >= times}
+
+
+# the personnel of `company` present in any of its reports between `start` & `end`
+def find_all_ids_present_in_any(
+    company: misc.Company, start: datetime.date, end: datetime.date, /
+) -> set[str]:
+    return find_all_ids_present_at_least(company, 1, start, end)
+
+
+# the personnel of `company` present in every one of its reports between `start` &
+# `end`, archived ones included
+def find_all_ids_present_in_all(
+    company: misc.Company, start: datetime.date, end: datetime.date, /
+) -> set[str]:
+    reports = sum(
+        routing.scalar(
+            sqlalchemy.select(sqlalchemy.func.count())
+            .select_from(table)
+            .filter(table.company == company.name)
+            .filter(table.date >= start)
+            .filter(table.date <= end)
+        )
+        for table in (Report, ArchivedReport)
+    )
+    if not reports:
+        return set()
+    return find_all_ids_present_at_least(company, reports, start, end)
+
+
 def find_all_reports_by_date(date: datetime.date, /) -> list[Report]:
-    return db.session.scalars(
+    return routing.scalars(
         sqlalchemy.select(Report)
         .filter(Report.date == date)
-        .filter(Report.presence.any())
     ).all()
 
 
@@ -116,52 +426,148 @@ def find_report_by_date_and_company(
     )
 
 
-# empty reports will be hidden, however they'll still persist!
-# TODO: find a way to bulk delete all empty reports without interfering with an ongoing transaction
+# the key reports are paginated by
+REPORT_KEYS = [Report.date, Report.id]
+# distinct reports are unique by date alone
+DISTINCT_REPORT_KEYS = [Report.date]
+
+
+# the reports, hot & archived, as rows of `id`, `date`, `company` & `last_edited`,
+# of `company` only unless None. the reports of closed months are moved to the
+# archive (see `archive_dal.archive`), so the listings page through both. the filter
+# is applied to either table, so each uses its date & company index
+def listed_reports(company: misc.Company | None = None, /) -> sqlalchemy.Subquery:
+    statements = []
+    for table in (Report, ArchivedReport):
+        statement = sqlalchemy.select(
+            table.id, table.date, table.company, table.last_edited
+        )
+        if company is not None:
+            statement = statement.filter(table.company == company.name)
+        statements.append(statement)
+    return sqlalchemy.union_all(*statements).subquery("reports")
+
+
+# `keys` (of `Report`) as the columns of `reports`, a subquery of `listed_reports`
+def keys_of(
+    reports: sqlalchemy.Subquery, keys: list[sqlalchemy.ColumnElement], /
+) -> list[sqlalchemy.ColumnElement]:
+    return [reports.c[column.key] for column in keys]
+
+
+def is_valid_cursor(cursor: str | None, /) -> bool:
+    return keyset.is_valid_cursor(cursor, REPORT_KEYS)
+
+
+def is_valid_distinct_cursor(cursor: str | None, /) -> bool:
+    return keyset.is_valid_cursor(cursor, DISTINCT_REPORT_KEYS)
+
+
+# rows of `listed_reports`, archived ones included. empty reports which were never
+# submitted are listed until `delete_all_empty_reports` purges them
 def find_all_reports_by_company(
-    company: misc.Company, order: Order, page=1, per_page=20, /
-) -> Pagination:
-    return db.paginate(
-        sqlalchemy.select(Report)
-        .filter(Report.company == company.name)
-        .filter(Report.presence.any())
-        .order_by(
-            sqlalchemy.asc(Report.date)
-            if order == Order.ASC
-            else sqlalchemy.desc(Report.date)
-        ),
-        page=page,
-        per_page=per_page,
+    company: misc.Company,
+    order: Order,
+    cursor: str | None = None,
+    per_page: int = 20,
+    /,
+    count: bool = False,
+) -> keyset.Page:
+    reports = listed_reports(company)
+    return keyset.paginate(
+        sqlalchemy.select(reports),
+        keys_of(reports, REPORT_KEYS),
+        order,
+        cursor,
+        per_page,
+        count=count,
     )
 
 
-def delete_all_empty_reports_by_company(company: misc.Company) -> None:
-    empty_reports = db.session.scalars(
-        sqlalchemy.select(Report)
-        .filter(Report.company == company.name)
-        .filter(Report.presence)
-        .order_by(Report.id.asc)
-    ).all()
+# the reports which were never submitted & have no presence in either storage: an
+# anti join with their presence. a submission with nobody present is kept
+def empty_reports_statement() -> sqlalchemy.Select:
+    return (
+        sqlalchemy.select(Report.id)
+        .filter(Report.submitted.is_(False))
+        .outerjoin(
+            personnel_report_rel,
+            sqlalchemy.and_(
+                personnel_report_rel.c.report_id == Report.id,
+                personnel_report_rel.c.report_date == Report.date,
+            ),
+        )
+        .filter(personnel_report_rel.c.report_id.is_(None))
+        .filter(Report.presence_bitmap.is_(None))
+    )
 
-    delete_all(empty_reports)
+
+# deletes the never submitted empty reports (see `empty_reports_statement`) last
+# edited more than `grace` ago, `batch_size` reports at a time. every batch is a
+# short transaction of its own, so the purge never holds its locks for long, and the
+# grace period keeps it off the reports being edited right now. returns the number of
+# deleted reports or None on failure
+def delete_all_empty_reports(
+    batch_size: int = 1000,
+    grace: datetime.timedelta = datetime.timedelta(minutes=10),
+    /,
+) -> int | None:
+    deleted = 0
+    try:
+        while ids := db.session.scalars(
+            empty_reports_statement()
+            .filter(Report.last_edited < datetime.datetime.now() - grace)
+            .order_by(Report.id)
+            .limit(batch_size)
+        ).all():
+            deleted += delete_by_ids(ids)
+            db.session.commit()
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return None
+    return deleted
 
 
+# a row per reported date holding `date`, the number of `companies` which reported,
+# the `present` total across them and the time the latest of them was `last_edited`.
+# the counts come from the presence summary, which covers both storages & is kept
+# for archived reports. a date is listed once it has a report, hot or archived,
+# whether anyone was present or its summary exists
 def find_all_distinct_reports(
-    order: Order, page: int = 1, per_page: int = 20, /
-) -> Pagination:
-    return db.paginate(
-        sqlalchemy.select(Report)
-        .filter(Report.presence.any())
-        .distinct(Report.date)  # only works for postgres!
-        .order_by(
-            sqlalchemy.asc(Report.date)
-            if order == Order.ASC
-            else sqlalchemy.desc(Report.date)
-        ),
-        page=page,
-        per_page=per_page,
+    order: Order,
+    cursor: str | None = None,
+    per_page: int = 20,
+    /,
+    count: bool = False,
+) -> keyset.Page:
+    reports = listed_reports()
+    return keyset.paginate(
+        sqlalchemy.select(
+            reports.c.date,
+            sqlalchemy.func.count(sqlalchemy.distinct(reports.c.company)).label(
+                "companies"
+            ),
+            sqlalchemy.func.coalesce(
+                sqlalchemy.func.sum(presence_summary.c.present), 0
+            ).label("present"),
+            sqlalchemy.func.max(reports.c.last_edited).label("last_edited"),
+        )
+        .outerjoin(
+            presence_summary,
+            sqlalchemy.and_(
+                presence_summary.c.date == reports.c.date,
+                presence_summary.c.company == reports.c.company,
+            ),
+        )
+        .group_by(reports.c.date),
+        keys_of(reports, DISTINCT_REPORT_KEYS),
+        order,
+        cursor,
+        per_page,
+        count=count,
     )
 
 
 def find_all_reports() -> list[Report]:
-    return db.session.scalars(sqlalchemy.select(Report)).all()
+    return routing.scalars(sqlalchemy.select(Report)).all()
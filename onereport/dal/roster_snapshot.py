@@ -0,0 +1,372 @@
+import os
+import mmap
+import array
+import bisect
+import struct
+import hashlib
+import datetime
+import tempfile
+import itertools
+import threading
+import unicodedata
+from typing import NamedTuple, Self
+from flask import current_app
+import sqlalchemy
+from sqlalchemy.exc import SQLAlchemyError
+from onereport.dal import PersonnelOrderBy, Order, routing, versions
+from onereport.data import Personnel, misc
+
+try:
+    import fcntl
+except ImportError:  # windows. concurrent rebuilds are harmless, merely redundant
+    fcntl = None
+
+# a read-only snapshot of the whole roster in a file every (gunicorn) worker maps into
+# memory, so the rosters are neither queried nor held once per worker. the file of
+# roster version `v` is built once, by the first worker which needs it, and the rest
+# map the very same pages.
+#
+# the snapshot is a columnar index: rows are ordered by company & id, each column is
+# an array of codes and every sort key has a precomputed permutation, so filtering &
+# sorting a roster is slicing & compressing arrays and only the rows of the result
+# are decoded. layout (arrays of 4 byte items are 4 byte aligned):
+#   header: magic, format, roster epoch & version, number of personnel
+#   starts: where each company begins
+#   platoons, active: a byte per personnel (platoons are coded by `misc.Platoon` order)
+#   added, removed: the ordinal of `date_added` & `date_removed` (`NEVER` if none)
+#   offsets: where the id, first name & last name (`SEPARATOR` separated) of each
+#     personnel begin in `text`
+#   per `PersonnelOrderBy`:
+#     order: the personnel sorted by the key
+#     active: `active` in `order`'s order
+#     company order: the personnel sorted by company then by the key, so the roster
+#       of a company sorted by the key is its slice of `starts`
+#     company active: `active` in `company order`'s order
+#   text: utf-8
+MAGIC = b"ONRS"
+FORMAT = 5
+HEADER = struct.Struct("<4sI16sqI")
+COMPANIES = list(misc.Company)
+PLATOONS = list(misc.Platoon)
+SEPARATOR = "\x1f"
+NEVER = 2**31 - 1
+
+# hebrew collation: final letters sort as their regular form, and niqqud, geresh,
+# gershayim, hyphens & spaces are ignored
+FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+IGNORED = {"־", "׳", "״", "'", '"', "-", " "}
+
+
+def collation_key(name: str, /) -> tuple[str, str]:
+    letters = "".join(
+        c
+        for c in unicodedata.normalize("NFKD", name)
+        if not unicodedata.combining(c) and c not in IGNORED
+    )
+    # the name itself breaks ties between names which collate equally
+    return letters.translate(FINAL_LETTERS).casefold(), name
+
+
+SORT_KEYS = {
+    PersonnelOrderBy.ID: lambda row: row.id,
+    PersonnelOrderBy.FIRST_NAME: lambda row: collation_key(row.first_name),
+    PersonnelOrderBy.LAST_NAME: lambda row: collation_key(row.last_name),
+    # by their names, as the db sorts them (see `Coded.by_name`)
+    PersonnelOrderBy.COMPANY: lambda row: row.company,
+    PersonnelOrderBy.PLATOON: lambda row: row.platoon,
+}
+
+
+# sorts `rows` as the snapshot does, so a roster the db serves (no snapshot, or one of
+# a past date) comes in the very same order: by `order_by`'s key, ties broken by id
+def sort(rows: list, order_by: PersonnelOrderBy, order: Order, /) -> list:
+    key = SORT_KEYS[order_by]
+    rows = sorted(rows, key=lambda row: (key(row), row.id))
+    if order == Order.DESC:
+        rows.reverse()
+    return rows
+
+
+# shaped like a row of `personnel_dal.ROW_COLUMNS`
+class RosterRow(NamedTuple):
+    id: str
+    first_name: str
+    last_name: str
+    company: str
+    platoon: str
+    active: bool
+
+
+def align(position: int, /) -> int:
+    return (position + 3) & ~3
+
+
+def encode(epoch: str, version: int, rows: list[sqlalchemy.Row], /) -> bytes:
+    codes = {company.name: code for code, company in enumerate(COMPANIES)}
+    platoon_codes = {platoon.name: code for code, platoon in enumerate(PLATOONS)}
+    rows = sorted(rows, key=lambda row: (codes[row.company], row.id))
+    active = bytes(row.active for row in rows)
+
+    starts = array.array("I", [0] * (len(COMPANIES) + 1))
+    for row in rows:
+        starts[codes[row.company] + 1] += 1
+    for code in range(len(COMPANIES)):
+        starts[code + 1] += starts[code]
+
+    offsets, text = array.array("I", [0]), bytearray()
+    for row in rows:
+        text += SEPARATOR.join((row.id, row.first_name, row.last_name)).encode()
+        offsets.append(len(text))
+
+    sections = [
+        HEADER.pack(MAGIC, FORMAT, epoch.encode(), version, len(rows)),
+        starts,
+        bytes(platoon_codes[row.platoon] for row in rows),
+        active,
+        array.array("i", (row.date_added.toordinal() for row in rows)),
+        array.array(
+            "i",
+            (row.date_removed.toordinal() if row.date_removed else NEVER for row in rows),
+        ),
+        offsets,
+    ]
+    for key in PersonnelOrderBy:
+        # ties are broken by id, as `rows` is ordered by it
+        order = sorted(range(len(rows)), key=lambda index: SORT_KEYS[key](rows[index]))
+        company_order = sorted(order, key=lambda index: codes[rows[index].company])
+        for permutation in (order, company_order):
+            sections.extend(
+                (
+                    array.array("I", permutation),
+                    bytes(active[index] for index in permutation),
+                )
+            )
+    sections.append(bytes(text))
+
+    encoded = bytearray()
+    for section in sections:
+        if isinstance(section, array.array):
+            encoded += bytes(align(len(encoded)) - len(encoded))
+        encoded += section
+    return bytes(encoded)
+
+
+class Snapshot:
+    def __init__(self: Self, path: str, /) -> None:
+        with open(path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.view = memoryview(self.buffer)
+        magic, format, epoch, self.version, self.count = HEADER.unpack_from(self.view)
+        if magic != MAGIC or format != FORMAT:
+            raise ValueError(f"{path} isn't a roster snapshot of format {FORMAT}")
+        self.epoch = epoch.rstrip(b"\0").decode()
+
+        self.position = HEADER.size
+        self.starts = self.take("I", len(COMPANIES) + 1)
+        self.platoons = self.take("B", self.count)
+        self.active = self.take("B", self.count)
+        self.added = self.take("i", self.count)
+        self.removed = self.take("i", self.count)
+        self.offsets = self.take("I", self.count + 1)
+        # (order, active) per key, across the battalion & by company
+        self.orders, self.company_orders = {}, {}
+        for key in PersonnelOrderBy:
+            self.orders[key] = (self.take("I", self.count), self.take("B", self.count))
+            self.company_orders[key] = (
+                self.take("I", self.count),
+                self.take("B", self.count),
+            )
+        self.text = self.position
+
+    # the next section of the file, as an array of `count` items of `format`
+    def take(self: Self, format: str, count: int, /) -> memoryview:
+        if format != "B":
+            self.position = align(self.position)
+        size = struct.calcsize(format) * count
+        section = self.view[self.position : self.position + size].cast(format)
+        self.position += size
+        return section
+
+    def row(self: Self, index: int, /) -> RosterRow:
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        id, first_name, last_name = (
+            self.buffer[self.text + start : self.text + stop].decode().split(SEPARATOR)
+        )
+        return RosterRow(
+            id,
+            first_name,
+            last_name,
+            COMPANIES[bisect.bisect_right(self.starts, index) - 1].name,
+            PLATOONS[self.platoons[index]].name,
+            bool(self.active[index]),
+        )
+
+    # the indexes of the personnel of `company` (all of them if None) sorted by
+    # `order_by`. `active_only` keeps the active ones, `date` the ones active in it
+    def select(
+        self: Self,
+        company: misc.Company | None,
+        order_by: PersonnelOrderBy,
+        order: Order,
+        /,
+        active_only: bool = False,
+        date: datetime.date | None = None,
+    ) -> list[int]:
+        if company is None:
+            indexes, active = self.orders[order_by]
+        else:
+            code = COMPANIES.index(company)
+            start, stop = self.starts[code], self.starts[code + 1]
+            indexes, active = self.company_orders[order_by]
+            indexes, active = indexes[start:stop], active[start:stop]
+
+        selected = itertools.compress(indexes, active) if active_only else indexes
+        if date is not None:
+            day = date.toordinal()
+            added, removed = self.added, self.removed
+            selected = (
+                index for index in selected if added[index] <= day <= removed[index]
+            )
+        selected = list(selected)
+        if order == Order.DESC:
+            selected.reverse()
+        return selected
+
+    def roster(
+        self: Self,
+        company: misc.Company | None,
+        order_by: PersonnelOrderBy,
+        order: Order,
+        /,
+        active_only: bool = False,
+        date: datetime.date | None = None,
+    ) -> list[RosterRow]:
+        return [
+            self.row(index)
+            for index in self.select(
+                company, order_by, order, active_only=active_only, date=date
+            )
+        ]
+
+    def __repr__(self: Self) -> str:
+        return f"Snapshot(epoch: {self.epoch}, version: {self.version}, personnel: {self.count})"
+
+
+lock = threading.Lock()
+# the snapshot each database (of this process) is attached to
+attached: dict[str, Snapshot] = {}
+
+
+# snapshots of different databases may share a directory
+def prefix() -> str:
+    uri = current_app.config.get("SQLALCHEMY_DATABASE_URI", "")
+    return f"roster-{hashlib.sha256(uri.encode()).hexdigest()[:12]}"
+
+
+def build(directory: str, epoch: str, version: int, path: str, /) -> None:
+    rows = routing.execute(
+        sqlalchemy.select(
+            Personnel.id,
+            Personnel.first_name,
+            Personnel.last_name,
+            Personnel.company,
+            Personnel.platoon,
+            Personnel.active,
+            Personnel.date_added,
+            Personnel.date_removed,
+        )
+    ).all()
+
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(encode(epoch, version, rows))
+        os.replace(temporary, path)
+    except OSError:
+        os.remove(temporary)
+        raise
+    current_app.logger.info(f"built roster snapshot {path} of {len(rows)} personnel")
+
+
+# drops the snapshots of older versions. workers still attached to them keep their
+# mapping until they attach to the new one
+def remove_stale(directory: str, path: str, /) -> None:
+    name = prefix()
+    for entry in os.scandir(directory):
+        if entry.name.startswith(f"{name}-") and entry.path != path:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# the workers trust whatever snapshot they find in `directory`, so it must be the
+# app's own: created private, and refused if another user owns it or may write to it
+def ensure_directory(directory: str, /) -> None:
+    """
+    Raises:
+        OSError
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    status = os.stat(directory)
+    if hasattr(os, "getuid") and (
+        status.st_uid != os.getuid() or status.st_mode & 0o022
+    ):
+        raise OSError(f"{directory} must be owned & writable by the app's user only")
+
+
+# a snapshot is named & headed by the roster epoch & version, so one left behind by a
+# previous database, whose version restarted, is never taken for the current one
+def attach_or_build(directory: str, epoch: str, version: int, /) -> Snapshot:
+    """
+    Raises:
+        OSError,
+        ValueError
+    """
+    ensure_directory(directory)
+    path = os.path.join(directory, f"{prefix()}-{epoch}-{version}.{FORMAT}.bin")
+    if not os.path.exists(path):
+        with open(os.path.join(directory, f"{prefix()}.lock"), "a") as lock_file:
+            # the lock is released once the file is closed
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # another worker might have built it while this one waited
+            if not os.path.exists(path):
+                build(directory, epoch, version, path)
+                remove_stale(directory, path)
+    snapshot = Snapshot(path)
+    if (snapshot.epoch, snapshot.version) != (epoch, version):
+        raise ValueError(f"{path} isn't the snapshot of roster {epoch}-{version}")
+    return snapshot
+
+
+# the snapshot of the current roster version, None when snapshots are disabled (an
+# empty `ROSTER_SNAPSHOT_DIR`) or it can't be used, in which case the caller should
+# query the db
+def current() -> Snapshot | None:
+    directory = current_app.config.get("ROSTER_SNAPSHOT_DIR")
+    if directory is None:
+        directory = os.path.join(current_app.instance_path, "roster")
+    if not directory:
+        return None
+
+    epoch, version = versions.read(versions.ROSTER)
+    # the roster was never written
+    if epoch is None:
+        return None
+
+    name = prefix()
+    snapshot = attached.get(name)
+    if snapshot is not None and (snapshot.epoch, snapshot.version) == (epoch, version):
+        return snapshot
+
+    with lock:
+        snapshot = attached.get(name)
+        if snapshot is None or (snapshot.epoch, snapshot.version) != (epoch, version):
+            try:
+                snapshot = attached[name] = attach_or_build(directory, epoch, version)
+            except (OSError, ValueError, SQLAlchemyError) as e:
+                current_app.logger.error(f"{e}")
+                return None
+    return snapshot
@@ -0,0 +1,77 @@
+import time
+import sqlalchemy
+from typing import Any
+from flask import (
+    current_app,
+    g,
+    request,
+    session,
+    has_app_context,
+    has_request_context,
+)
+from flask_sqlalchemy.session import Session
+from onereport.data import db
+
+# the key of the read replica in `SQLALCHEMY_BINDS`. without it everything goes to
+# the primary
+REPLICA = "replica"
+
+
+# read your writes: once a request wrote, the rest of it (and the requests of the same
+# client in the next `REPLICA_STICKINESS` seconds, e.g. the redirect after a POST)
+# reads from the primary, which the replica might lag behind
+def mark_written() -> None:
+    if not has_app_context():
+        return
+
+    g.wrote = True
+    if has_request_context():
+        session["wrote_at"] = time.time()
+
+
+def on_flush(session: Session, flush_context: Any) -> None:
+    mark_written()
+
+
+def on_execute(state: sqlalchemy.orm.ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        mark_written()
+
+
+sqlalchemy.event.listen(Session, "after_flush", on_flush)
+sqlalchemy.event.listen(Session, "do_orm_execute", on_execute)
+
+
+# only the reads of safe requests go to the replica. a submission (e.g. the morning
+# report burst) reads & writes on the primary throughout
+def use_primary() -> bool:
+    if REPLICA not in current_app.config.get("SQLALCHEMY_BINDS", {}):
+        return True
+    if g.get("wrote", False):
+        return True
+    if not has_request_context():
+        return False
+    if request.method not in ("GET", "HEAD"):
+        return True
+    return time.time() - session.get("wrote_at", 0) < current_app.config.get(
+        "REPLICA_STICKINESS", 5
+    )
+
+
+def bind_arguments() -> dict[str, Any] | None:
+    return None if use_primary() else {"bind": db.engines[REPLICA]}
+
+
+# the read path of the dal. `db.session.execute` & `db.session.scalars`, routed to the
+# replica when there is one. never use it to load entities which are about to be
+# written, they'd hold the replica's (possibly stale) state
+def execute(statement: sqlalchemy.Executable, /) -> sqlalchemy.Result:
+    return db.session.execute(statement, bind_arguments=bind_arguments())
+
+
+def scalars(statement: sqlalchemy.Executable, /) -> sqlalchemy.ScalarResult:
+    return db.session.scalars(statement, bind_arguments=bind_arguments())
+
+
+def scalar(statement: sqlalchemy.Executable, /) -> Any:
+    return db.session.scalar(statement, bind_arguments=bind_arguments())
@@ -0,0 +1,220 @@
+import datetime
+from collections import Counter
+from flask import current_app
+from onereport.dal import bitmap, dialect, history, routing
+from onereport.data import db, misc, Personnel, Report
+from onereport.data.personnel_history import personnel_history
+from onereport.data.personnel_to_report import personnel_report_rel
+from onereport.data.presence_summary import presence_summary
+import sqlalchemy
+from sqlalchemy.exc import SQLAlchemyError
+
+
+# adds the personnel of `ids` to the present counts of the summary of the report of
+# `company` at `date`, by their platoons at `date`. doesn't commit
+def add_present(date: datetime.date, company: misc.Company, ids: set[str], /) -> None:
+    present = Counter(
+        db.session.scalars(
+            sqlalchemy.select(personnel_history.c.platoon)
+            .join(Personnel, Personnel.id == personnel_history.c.personnel_id)
+            .filter(personnel_history.c.personnel_id.in_(ids))
+            .filter(personnel_history.c.company == company.name)
+            .filter(history.valid_in(date))
+            .filter(history.active_in(date))
+        ).all()
+    )
+    if not present:
+        return
+
+    statement = dialect.insert(presence_summary)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[
+                presence_summary.c.date,
+                presence_summary.c.company,
+                presence_summary.c.platoon,
+            ],
+            set_={"present": presence_summary.c.present + statement.excluded.present},
+        ),
+        [
+            {
+                "date": date,
+                "company": company.name,
+                "platoon": platoon,
+                "present": count,
+                "total": 0,
+            }
+            for platoon, count in present.items()
+        ],
+    )
+
+
+# removes the summaries of the reports of `reports` (pairs of date & company name),
+# which are about to be deleted. doesn't commit
+def remove(reports: list[tuple[datetime.date, str]], /) -> None:
+    if not reports:
+        return
+
+    db.session.execute(
+        sqlalchemy.delete(presence_summary).where(
+            sqlalchemy.tuple_(presence_summary.c.date, presence_summary.c.company).in_(
+                reports
+            )
+        )
+    )
+
+
+def between(
+    column: sqlalchemy.ColumnElement,
+    start: datetime.date | None,
+    end: datetime.date | None,
+    /,
+) -> list[sqlalchemy.ColumnElement[bool]]:
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column <= end)
+    return conditions
+
+
+# counts the summaries of the reports matching `conditions` (over the `report` table)
+# into `presence_summary`, which holds none of them. returns the number of summary
+# rows. doesn't commit
+def count(conditions: list[sqlalchemy.ColumnElement[bool]], /) -> int:
+    report, history_columns = Report.__table__, personnel_history.c
+    inserted = db.session.execute(
+        sqlalchemy.insert(presence_summary).from_select(
+            ["date", "company", "platoon", "present", "total"],
+            sqlalchemy.select(
+                report.c.date,
+                history_columns.company,
+                history_columns.platoon,
+                sqlalchemy.func.count(personnel_report_rel.c.personnel_id),
+                sqlalchemy.func.count(),
+            )
+            .select_from(report)
+            .join(
+                personnel_history,
+                sqlalchemy.and_(
+                    history_columns.company == report.c.company,
+                    history.valid_in(report.c.date),
+                ),
+            )
+            .join(
+                Personnel.__table__,
+                sqlalchemy.and_(
+                    Personnel.id == history_columns.personnel_id,
+                    history.active_in(report.c.date),
+                ),
+            )
+            .outerjoin(
+                personnel_report_rel,
+                sqlalchemy.and_(
+                    personnel_report_rel.c.report_id == report.c.id,
+                    personnel_report_rel.c.report_date == report.c.date,
+                    personnel_report_rel.c.personnel_id == history_columns.personnel_id,
+                ),
+            )
+            .filter(*conditions)
+            .group_by(report.c.date, history_columns.company, history_columns.platoon),
+        )
+    ).rowcount
+    # the bitmap reports were counted as empty above
+    for date, company, presence_bitmap in db.session.execute(
+        sqlalchemy.select(report.c.date, report.c.company, report.c.presence_bitmap)
+        .filter(report.c.presence_bitmap.is_not(None))
+        .filter(*conditions)
+    ).all():
+        company = misc.Company[company]
+        add_present(
+            date, company, bitmap.to_ids(company, bitmap.decode(presence_bitmap))
+        )
+    return inserted
+
+
+# recounts the summaries of the reports between `start` & `end` (inclusive, either may
+# be None for unbounded) of `company` (all companies if None) from their presence & the
+# roster as it was at their dates, e.g. once a report is submitted or a change of the
+# personnel moved who served then. the summaries of archived reports are kept.
+# doesn't commit
+def recount(
+    start: datetime.date | None,
+    end: datetime.date | None = None,
+    company: misc.Company | None = None,
+    /,
+) -> None:
+    # the presence & the personnel changed within the transaction are read below
+    db.session.flush()
+    report = Report.__table__
+    conditions = between(report.c.date, start, end)
+    if company is not None:
+        conditions.append(report.c.company == company.name)
+    db.session.execute(
+        sqlalchemy.delete(presence_summary).where(
+            sqlalchemy.tuple_(presence_summary.c.date, presence_summary.c.company).in_(
+                sqlalchemy.select(report.c.date, report.c.company).filter(*conditions)
+            )
+        )
+    )
+    count(conditions)
+
+
+# recounts the summaries a change of the personnel affects: its versions are recorded
+# as of today, so the reports since the earliest of today & `dates` (the dates of
+# service the change moved, None skipped). doesn't commit
+def recount_changed(*dates: datetime.date | None) -> None:
+    recount(min([datetime.date.today(), *(date for date in dates if date is not None)]))
+
+
+# recounts the summaries of the reports between `start` & `end` (inclusive, either
+# may be None for unbounded) from scratch. returns the number of summary rows or
+# None on failure
+def rebuild(
+    start: datetime.date | None = None, end: datetime.date | None = None, /
+) -> int | None:
+    try:
+        db.session.execute(
+            sqlalchemy.delete(presence_summary).where(
+                *between(presence_summary.c.date, start, end)
+            )
+        )
+        inserted = count(between(Report.__table__.c.date, start, end))
+        db.session.commit()
+    except SQLAlchemyError as se:
+        current_app.logger.error(f"{se}")
+        db.session.rollback()
+        return None
+    return inserted
+
+
+def find_all_summaries_by_date(date: datetime.date, /) -> list[sqlalchemy.Row]:
+    return routing.execute(
+        sqlalchemy.select(presence_summary)
+        .filter(presence_summary.c.date == date)
+        .order_by(presence_summary.c.company, presence_summary.c.platoon)
+    ).all()
+
+
+# the daily totals of `company` (all companies if None) between `start` & `end`
+# (inclusive): rows of `date`, `present` & `total`
+def find_all_daily_totals(
+    start: datetime.date,
+    end: datetime.date,
+    company: misc.Company | None = None,
+    /,
+) -> list[sqlalchemy.Row]:
+    statement = (
+        sqlalchemy.select(
+            presence_summary.c.date,
+            sqlalchemy.func.sum(presence_summary.c.present).label("present"),
+            sqlalchemy.func.sum(presence_summary.c.total).label("total"),
+        )
+        .filter(presence_summary.c.date >= start)
+        .filter(presence_summary.c.date <= end)
+        .group_by(presence_summary.c.date)
+        .order_by(presence_summary.c.date)
+    )
+    if company is not None:
+        statement = statement.filter(presence_summary.c.company == company.name)
+    return routing.execute(statement).all()
@@ -1,8 +1,21 @@
-from typing import List, Tuple
+import email_validator
+from typing import Iterable, List, Tuple
 from flask import current_app
-from onereport.data import db, User
+from onereport.data import db, Personnel, User, Report
 from onereport.data import misc
-from onereport.dal import UserOrderBy, Order
+from onereport.data.cache import user_cache
+from onereport.data.personnel_to_report import personnel_report_rel
+from onereport.dal import (
+    UserOrderBy,
+    Order,
+    bitmap,
+    bulk_import,
+    dialect,
+    history,
+    personnel_dal,
+    summary_dal,
+    versions,
+)
 import sqlalchemy
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -13,6 +26,9 @@ def save(user: User, /) -> bool:
 
     try:
         db.session.add(user)
+        history.record([history.of(user)])
+        summary_dal.recount_changed(user.date_added)
+        versions.bump(versions.ROSTER)
         db.session.commit()
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
@@ -26,8 +42,15 @@ def update(original: User, new: User, /) -> bool:
         return False
 
     try:
+        email = original.email
+        removed = original.date_removed
         original.update_user(new)
+        history.record([history.of(original)])
+        summary_dal.recount_changed(removed, original.date_removed)
+        versions.bump(versions.ROSTER)
+        versions.bump(versions.USERS)
         db.session.commit()
+        user_cache.invalidate(email)
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
@@ -35,46 +58,232 @@ def update(original: User, new: User, /) -> bool:
     return True
 
 
-def save_all(users: list[User], /) -> bool:
-    if users is None or not users:
+USER_FIELDS = (*personnel_dal.PERSONNEL_FIELDS, "email", "role")
+
+
+# returns the reason a row of a bulk import is invalid, None if it's valid
+def validate_row(row: dict[str, str], /) -> str | None:
+    missing = bulk_import.missing_fields(row, USER_FIELDS)
+    if missing:
+        return f"missing {', '.join(missing)}"
+    if not misc.Role.is_valid(row["role"]):
+        return f"invalid role {row['role']}"
+    try:
+        email_validator.validate_email(row["email"], check_deliverability=False)
+    except email_validator.EmailNotValidError:
+        return f"invalid email {row['email']}"
+    return personnel_dal.validate_row(row)
+
+
+# streams `rows` (dicts shaped like `USER_FIELDS`) into the db `chunk_size` rows at a
+# time. an existing personnel with the same id is promoted in place. each chunk is a
+# single upsert & commit, so an invalid row or a failing chunk doesn't roll back the
+# rest of the import
+def save_all(
+    rows: Iterable[dict[str, str]], chunk_size: int = 500, /
+) -> bulk_import.ImportSummary:
+    summary = bulk_import.ImportSummary()
+    if rows is None:
+        return summary
+
+    seen_ids, seen_emails = set(), set()
+    for chunk in bulk_import.chunked(rows, chunk_size):
+        candidates = []
+        for index, row in chunk:
+            reason = validate_row(row)
+            if reason is not None:
+                summary.reject(row, index, reason)
+                continue
+
+            personnel = personnel_dal.to_table_row(row, "user")
+            user = {
+                "id": personnel["id"],
+                "email": row["email"].strip().lower(),
+                "role": row["role"],
+            }
+            if user["id"] in seen_ids:
+                summary.reject(row, index, "duplicate id")
+            elif user["email"] in seen_emails:
+                summary.reject(row, index, "duplicate email")
+            else:
+                seen_ids.add(user["id"])
+                seen_emails.add(user["email"])
+                candidates.append((index, row, personnel, user))
+
+        if not candidates:
+            continue
+
+        # until the owners are checked every candidate is pending
+        valid = [(personnel, user) for _, _, personnel, user in candidates]
+        try:
+            owners = dict(
+                db.session.execute(
+                    sqlalchemy.select(User.email, User.id).filter(
+                        User.email.in_([user["email"] for *_, user in candidates])
+                    )
+                ).all()
+            )
+            valid = []
+            for index, row, personnel, user in candidates:
+                if owners.get(user["email"], user["id"]) != user["id"]:
+                    summary.reject(row, index, "email belongs to another user")
+                else:
+                    valid.append((personnel, user))
+
+            if not valid:
+                continue
+
+            ids = [user["id"] for _, user in valid]
+            existing = set(
+                db.session.scalars(
+                    sqlalchemy.select(User.__table__.c.id).filter(
+                        User.__table__.c.id.in_(ids)
+                    )
+                ).all()
+            )
+
+            personnel_dal.upsert([personnel for personnel, _ in valid], True)
+            statement = dialect.insert(User.__table__)
+            db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[User.__table__.c.id],
+                    set_={
+                        "email": statement.excluded.email,
+                        "role": statement.excluded.role,
+                    },
+                ),
+                [user for _, user in valid],
+            )
+            versions.bump(versions.USERS)
+            db.session.commit()
+            user_cache.clear()
+        except SQLAlchemyError as se:
+            current_app.logger.error(f"{se}")
+            db.session.rollback()
+            summary.rejected.extend(
+                (user["id"], "database error") for _, user in valid
+            )
+            continue
+
+        summary.inserted.extend(id for id in ids if id not in existing)
+        summary.updated.extend(id for id in ids if id in existing)
+
+    return summary
+
+
+# removes the (now stale) instance of `id` from the session, so the next lookup
+# loads it as its new polymorphic type
+def expunge(id: str, /) -> None:
+    instance = db.session.identity_map.get(sqlalchemy.orm.util.identity_key(Personnel, id))
+    if instance is not None:
+        db.session.expunge(instance)
+
+
+# turns the personnel of `user.id` into `user` in place, in a single transaction: its
+# personnel row is updated & a `user` row is inserted. its presence is left untouched
+def promote(user: User, /) -> bool:
+    if user is None:
         return False
 
+    personnel = Personnel.__table__
     try:
-        db.session.add_all(users)
+        # the removal the promotion undoes
+        removed = db.session.scalar(
+            sqlalchemy.select(personnel.c.date_removed).filter(
+                personnel.c.id == user.id
+            )
+        )
+        updated = db.session.execute(
+            sqlalchemy.update(personnel)
+            .where(personnel.c.id == user.id)
+            .where(personnel.c.type == "personnel")
+            .values(
+                first_name=user.first_name,
+                last_name=user.last_name,
+                company=user.company,
+                platoon=user.platoon,
+                active=True,
+                date_removed=None,
+                type="user",
+            )
+        ).rowcount
+        if updated != 1:
+            current_app.logger.error(f"no personnel to promote with id {user.id}")
+            db.session.rollback()
+            return False
+
+        db.session.execute(
+            sqlalchemy.insert(User.__table__).values(
+                id=user.id, email=user.email, role=user.role
+            )
+        )
+        history.record([history.of(user)])
+        summary_dal.recount_changed(removed)
+        versions.bump(versions.ROSTER)
+        versions.bump(versions.USERS)
         db.session.commit()
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
         return False
+    finally:
+        expunge(user.id)
     return True
 
 
-def delete(user: User, /) -> bool:
+# turns `user` into a plain personnel in place, in a single transaction: its `user`
+# row is deleted & its type flipped. its presence & the reports it last edited are
+# left untouched
+def demote(user: User, /) -> bool:
     if user is None:
         return False
 
+    id, email = user.id, user.email
     try:
-        db.session.delete(user)
+        db.session.execute(
+            sqlalchemy.delete(User.__table__).where(User.__table__.c.id == id)
+        )
+        db.session.execute(
+            sqlalchemy.update(Personnel.__table__)
+            .where(Personnel.__table__.c.id == id)
+            .values(type="personnel")
+        )
+        versions.bump(versions.ROSTER)
+        versions.bump(versions.USERS)
         db.session.commit()
+        user_cache.invalidate(email)
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
         return False
+    finally:
+        expunge(id)
     return True
 
 
-def delete_all(users: list[User], /) -> bool:
-    if users is None or not users:
+def delete(user: User, /) -> bool:
+    if user is None:
         return False
 
     try:
-        for user in users:
-            try:
-                db.session.delete(user)
-            except SQLAlchemyError as se:
-                current_app.logger.error(f"{se}")
-                db.session.rollback()
+        email = user.email
+        db.session.execute(
+            sqlalchemy.update(Report.__table__)
+            .where(Report.__table__.c.edited_by_id == user.id)
+            .values(edited_by_id=None)
+        )
+        db.session.execute(
+            sqlalchemy.delete(personnel_report_rel).where(
+                personnel_report_rel.c.personnel_id == user.id
+            )
+        )
+        bitmap.release([user.id])
+        db.session.delete(user)
+        summary_dal.recount_changed(user.date_added)
+        versions.bump(versions.ROSTER)
+        versions.bump(versions.USERS)
         db.session.commit()
+        user_cache.invalidate(email)
     except SQLAlchemyError as se:
         current_app.logger.error(f"{se}")
         db.session.rollback()
@@ -102,25 +311,44 @@ def find_user_by_email(email: str, /) -> User | None:
     return db.session.scalar(sqlalchemy.select(User).filter(User.email == email))
 
 
+# the columns a users list displays. see `personnel_dal.ROW_COLUMNS`
+ROW_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.role,
+    User.company,
+    User.platoon,
+    User.active,
+)
+
+
 def construct_statement(
-    order_by: UserOrderBy, order: Order, /
+    order_by: UserOrderBy, order: Order, /, rows: bool = False
 ) -> sqlalchemy.Select[Tuple]:
+    statement = sqlalchemy.select(*ROW_COLUMNS) if rows else sqlalchemy.select(User)
+    column = personnel_dal.sort_column(User, order_by)
     return (
-        sqlalchemy.select(User).order_by(sqlalchemy.asc(order_by.name.lower()))
+        statement.order_by(sqlalchemy.asc(column))
         if order == Order.ASC
-        else sqlalchemy.select(User).order_by(sqlalchemy.desc(order_by.name.lower()))
+        else statement.order_by(sqlalchemy.desc(column))
     )
 
 
-def find_all_active_users(order_by: UserOrderBy, order: Order, /) -> List[User]:
-    statement = construct_statement(order_by, order)
+def find_all_active_users(
+    order_by: UserOrderBy, order: Order, /, rows: bool = False
+) -> List[User] | list[sqlalchemy.Row]:
+    statement = construct_statement(order_by, order, rows=rows)
 
-    return db.session.scalars(
-        statement.filter(User.active).filter(User.role != misc.Role.ADMIN.name)
-    ).all()
+    return personnel_dal.fetch(
+        statement.filter(User.active).filter(User.role != misc.Role.ADMIN.name), rows
+    )
 
 
-def find_all_users(order_by: UserOrderBy, order: Order, /) -> List[User]:
-    statement = construct_statement(order_by, order)
+def find_all_users(
+    order_by: UserOrderBy, order: Order, /, rows: bool = False
+) -> List[User] | list[sqlalchemy.Row]:
+    statement = construct_statement(order_by, order, rows=rows)
 
-    return db.session.scalars(statement).all()
+    return personnel_dal.fetch(statement, rows)
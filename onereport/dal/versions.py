@@ -0,0 +1,43 @@
+import secrets
+from flask import g, has_app_context
+from onereport.dal import dialect, routing
+from onereport.data import db
+from onereport.data.data_version import data_version
+import sqlalchemy
+
+ROSTER = "roster"
+# the users & their roles, which every worker keeps in `user_cache`
+USERS = "users"
+
+
+# bumps the version of `name`. doesn't commit, so it's part of the caller's write
+def bump(name: str, /) -> None:
+    statement = dialect.insert(data_version).values(
+        name=name, version=1, epoch=secrets.token_hex(8)
+    )
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[data_version.c.name],
+            set_={"version": data_version.c.version + 1},
+        )
+    )
+    if has_app_context():
+        g.pop("data_versions", None)
+
+
+# the epoch & version of `name`, read at most once per request. (None, 0) until it's
+# first bumped
+def read(name: str, /) -> tuple[str | None, int]:
+    versions = g.setdefault("data_versions", {}) if has_app_context() else {}
+    if name not in versions:
+        row = routing.execute(
+            sqlalchemy.select(data_version.c.epoch, data_version.c.version).filter(
+                data_version.c.name == name
+            )
+        ).first()
+        versions[name] = (row.epoch, row.version) if row is not None else (None, 0)
+    return versions[name]
+
+
+def current(name: str, /) -> int:
+    return read(name)[1]
@@ -1,4 +1,5 @@
 from onereport.data.base import db, login_manager  # noqa: F401
 from onereport.data.personnel import Personnel # noqa: F401
 from onereport.data.user import User # noqa: F401
-from onereport.data.report import Report # noqa: F401
\ No newline at end of file
+from onereport.data.report import Report # noqa: F401
+from onereport.data.archived_report import ArchivedReport # noqa: F401
\ No newline at end of file
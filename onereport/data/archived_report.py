@@ -0,0 +1,44 @@
+import datetime
+import zlib
+import sqlalchemy.orm as orm
+from sqlalchemy import Index
+from typing import Optional, Self
+from onereport.data.base import db
+from onereport.data.coded import COMPANY
+from onereport.data.user import User
+
+SEPARATOR = "\x1f"
+
+
+# the presence of an archived report: the zlib compressed, sorted ids joined by
+# `SEPARATOR`
+def encode_presence(ids: set[str], /) -> bytes:
+    return zlib.compress(SEPARATOR.join(sorted(ids)).encode())
+
+
+def decode_presence(data: bytes, /) -> set[str]:
+    text = zlib.decompress(data).decode()
+    return set(text.split(SEPARATOR)) if text else set()
+
+
+# a report of a closed month moved out of the hot tables (see `dal/archive_dal.py`).
+# it keeps its id, so links to it still resolve, and is shaped like `Report` where
+# it's rendered. there's no foreign key to its editor, the archive outlives the users
+class ArchivedReport(db.Model):
+    __tablename__ = "report_archive"
+    # the date & company lookups of the readers of presence by date
+    __table_args__ = (Index("ix_report_archive_date_company", "date", "company"),)
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True, autoincrement=False)
+    date: orm.Mapped[datetime.date]
+    company: orm.Mapped[str] = orm.mapped_column(COMPANY)
+    last_edited: orm.Mapped[datetime.datetime]
+    edited_by_id: orm.Mapped[Optional[str]]
+    edited_by: orm.Mapped[Optional["User"]] = orm.relationship(
+        primaryjoin="foreign(ArchivedReport.edited_by_id) == User.id", viewonly=True
+    )
+    # the ids of the present personnel, see `encode_presence`
+    presence: orm.Mapped[bytes]
+
+    def __repr__(self: Self) -> str:
+        return f"ArchivedReport(date: {self.date.day}/{self.date.month}/{self.date.year}, company: {self.company})"
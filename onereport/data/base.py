@@ -1,5 +1,6 @@
 import sqlalchemy.orm as orm
 from flask_sqlalchemy import SQLAlchemy
+from flask import current_app
 from flask_login import LoginManager
 from sqlalchemy import select
 
@@ -14,7 +15,38 @@ login_manager.login_message_category = "info"
 login_manager.login_message = "אנא התחבר למערכת על מנת להכנס"
 
 from onereport.data.user import User  # noqa: E402
+from onereport.data.cache import user_cache  # noqa: E402
 
+
+# a detached copy of the loaded columns of `user`, which isn't bound to any session
+def snapshot(user: User, /) -> User:
+    mapper = orm.class_mapper(User)
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        setattr(copy, attr.key, getattr(user, attr.key))
+    orm.make_transient_to_detached(copy)
+    return copy
+
+
+# runs on every authenticated request. a cached user is merged into the session
+# without loading it, so a steady state page load only reads the users version. the
+# cached copy is tagged with that version, which every write to a user bumps, so an
+# edit (e.g. a demotion) made by any worker is seen by the rest on their next request
 @login_manager.user_loader
 def load_user(email: str) -> User | None:
-    return db.session.scalar(select(User).filter(User.email == email))
\ No newline at end of file
+    # the dal is built on this module
+    from onereport.dal import versions
+
+    version = versions.current(versions.USERS)
+    cached = user_cache.get(email)
+    if cached is not None and cached[0] == version:
+        return db.session.merge(cached[1], load=False)
+
+    user = db.session.scalar(select(User).filter(User.email == email))
+    if user is not None:
+        user_cache.put(
+            email,
+            (version, snapshot(user)),
+            current_app.config.get("USER_CACHE_TTL", 60),
+        )
+    return user
\ No newline at end of file
@@ -0,0 +1,59 @@
+import time
+import threading
+from typing import Any, Hashable, Self
+
+
+class TTLCache:
+    """
+    a thread safe, per process key-value cache whose entries expire `ttl` seconds
+    after they were put. once `max_size` is reached the oldest entry is evicted
+    """
+
+    def __init__(self: Self, max_size: int = 1024, /) -> None:
+        self.max_size = max_size
+        self.entries: dict[Hashable, tuple[float, Any]] = {}
+        self.lock = threading.Lock()
+
+    def get(self: Self, key: Hashable, /) -> Any | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            return value
+
+    def put(self: Self, key: Hashable, value: Any, ttl: float, /) -> None:
+        if ttl <= 0:
+            return
+
+        with self.lock:
+            self.entries.pop(key, None)
+            if len(self.entries) >= self.max_size:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self: Self, key: Hashable, /) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self: Self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self: Self) -> int:
+        return len(self.entries)
+
+    def __repr__(self: Self) -> str:
+        return f"TTLCache(entries: {len(self)}, max size: {self.max_size})"
+
+
+# the users `load_user` resolved, keyed by email, each with the users version it was
+# read at. see `versions.USERS`
+user_cache = TTLCache()
+# company rosters the db served while no snapshot could be used, keyed by company,
+# sort order & roster version. see `personnel_dal.fetch_roster`
+roster_cache = TTLCache(256)
@@ -0,0 +1,56 @@
+from enum import Enum
+from typing import Any, Self
+import sqlalchemy
+from sqlalchemy import SmallInteger, TypeDecorator, Dialect
+from onereport.data import misc
+
+
+class Coded(TypeDecorator):
+    """
+    a name out of a fixed set stored as its position in the set, a small integer.
+    python sees the names, so it's compared & assigned as a string would be. codes
+    are positions: members may only ever be appended
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self: Self, names: tuple[str, ...]) -> None:
+        super().__init__()
+        self.names = names
+        self.codes = {name: code for code, name in enumerate(names)}
+
+    @staticmethod
+    def of(enum: type[Enum], /) -> "Coded":
+        return Coded(tuple(enum._member_names_))
+
+    def process_bind_param(
+        self: Self, value: str | None, dialect: Dialect
+    ) -> int | None:
+        if value is None:
+            return None
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f"{value} isn't one of {', '.join(self.names)}")
+
+    # sorts `column` by the names rather than by the codes, the order it had before it
+    # was coded
+    def by_name(
+        self: Self, column: sqlalchemy.ColumnElement, /
+    ) -> sqlalchemy.ColumnElement:
+        return sqlalchemy.case(
+            {self.codes[name]: rank for rank, name in enumerate(sorted(self.names))},
+            value=sqlalchemy.type_coerce(column, SmallInteger),
+        )
+
+    # `int` since a sqlite column declared as text before the migration to codes holds
+    # them as text
+    def process_result_value(self: Self, value: Any, dialect: Dialect) -> str | None:
+        return None if value is None else self.names[int(value)]
+
+
+COMPANY = Coded.of(misc.Company)
+PLATOON = Coded.of(misc.Platoon)
+ROLE = Coded.of(misc.Role)
+PERSONNEL_TYPE = Coded(("personnel", "user"))
@@ -0,0 +1,15 @@
+from sqlalchemy import Table, Column, String, Integer
+from onereport.data.base import Base
+
+# a counter per cached data set (e.g. "roster"), bumped in the same transaction as
+# every write to it. in-process caches key their entries by it, so a write made
+# by one worker invalidates the entries of every other worker on their next read.
+# the random epoch is drawn when the row is created, so the versions of a recreated
+# (or another) database are told apart from the ones they restart at
+data_version = Table(
+    "data_version",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+    Column("epoch", String, nullable=True),
+)
@@ -0,0 +1,917 @@
+import datetime
+import logging
+import secrets
+import sqlalchemy
+from typing import Callable, Self
+from sqlalchemy import (
+    Table,
+    Column,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Index,
+    PrimaryKeyConstraint,
+    UniqueConstraint,
+    Boolean,
+    Date,
+    DateTime,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+)
+from sqlalchemy.dialects import postgresql
+from onereport.data.base import Base
+from onereport.data import partitions
+
+# every applied migration gets a row here. `db_create` stamps all of them since
+# `create_all()` already builds the latest schema
+schema_migration = Table(
+    "schema_migration",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.datetime.now),
+)
+
+
+class Migration:
+    def __init__(
+        self: Self,
+        version: int,
+        description: str,
+        upgrade: Callable[[sqlalchemy.Connection], None],
+        /,
+    ) -> None:
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+    def __repr__(self: Self) -> str:
+        return f"Migration(version: {self.version}, description: {self.description})"
+
+
+def is_postgres(connection: sqlalchemy.Connection, /) -> bool:
+    return connection.dialect.name == "postgresql"
+
+
+def find_index(table: Table, name: str, /) -> sqlalchemy.Index:
+    return next(index for index in table.indexes if index.name == name)
+
+
+# builds an index without blocking writes to its table. on postgres the index is
+# built CONCURRENTLY (which can't run inside a transaction) and an invalid
+# leftover of a previously failed build is dropped first
+def create_index(connection: sqlalchemy.Connection, index: sqlalchemy.Index, /) -> None:
+    ddl = str(
+        sqlalchemy.schema.CreateIndex(index, if_not_exists=True).compile(
+            dialect=connection.dialect
+        )
+    )
+
+    if not is_postgres(connection):
+        connection.execute(sqlalchemy.text(ddl))
+        return
+
+    connection.commit()
+    connection.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        valid = connection.scalar(
+            sqlalchemy.text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ),
+            {"name": index.name},
+        )
+        if valid is False:
+            connection.execute(
+                sqlalchemy.text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}")
+            )
+        connection.execute(
+            sqlalchemy.text(ddl.replace("INDEX", "INDEX CONCURRENTLY", 1))
+        )
+    finally:
+        connection.execution_options(isolation_level=connection.default_isolation_level)
+
+
+# whether `index` is built on `dialect`. some indexes exist on a single dialect
+# (e.g. the gist index of `personnel.service_period`)
+def applies_to(index: sqlalchemy.Index, dialect: sqlalchemy.Dialect, /) -> bool:
+    ddl_if = index._ddl_if
+    return ddl_if is None or ddl_if.dialect in (None, dialect.name)
+
+
+def create_indexes(
+    *indexes: tuple[Table, str],
+) -> Callable[[sqlalchemy.Connection], None]:
+    def upgrade(connection: sqlalchemy.Connection) -> None:
+        for table, name in indexes:
+            index = find_index(table, name)
+            if applies_to(index, connection.dialect):
+                create_index(connection, index)
+
+    return upgrade
+
+
+# every migration runs against the schema of its own version rather than the models,
+# which follow the latest one: a released migration must keep doing what it did
+# whatever the models become. so a migration only touches the frozen copies of the
+# tables declared alongside it, as it found (or left) them. never edit a frozen
+# table, a schema change declares its own copies
+
+# the schema up to version 4, company, platoon, role & type stored as their names
+metadata_v1 = sqlalchemy.MetaData()
+
+personnel_v1 = Table(
+    "personnel",
+    metadata_v1,
+    Column("id", String, primary_key=True),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("company", String, nullable=False),
+    Column("platoon", String, nullable=False),
+    Column("active", Boolean, nullable=False),
+    Column("date_added", Date, nullable=False),
+    Column("date_removed", Date, nullable=True),
+    Column("type", String, nullable=False),
+    Index(
+        "ix_personnel_company_active_last_name",
+        "company",
+        "active",
+        "last_name",
+        "first_name",
+    ),
+    Index("ix_personnel_company_date_added", "company", "date_added"),
+    Index("ix_personnel_date_added_date_removed", "date_added", "date_removed"),
+)
+
+user_v1 = Table(
+    "user",
+    metadata_v1,
+    Column("id", String, ForeignKey("personnel.id"), primary_key=True),
+    Column("email", String, nullable=False, unique=True),
+    Column("role", String, nullable=False),
+)
+
+report_v1 = Table(
+    "report",
+    metadata_v1,
+    Column("id", Integer, primary_key=True),
+    Column("date", Date, nullable=False),
+    Column("company", String, nullable=False),
+    Column("last_edited", DateTime, nullable=False),
+    Column("edited_by_id", String, ForeignKey("user.id"), nullable=True),
+    Index("ux_report_date_company", "date", "company", unique=True),
+    Index("ix_report_company_date", "company", "date"),
+)
+
+personnel_report_rel_v1 = Table(
+    "personnel_report_rel",
+    metadata_v1,
+    Column("report_id", Integer, ForeignKey("report.id"), primary_key=True),
+    Column("personnel_id", String, ForeignKey("personnel.id"), primary_key=True),
+    Index("ix_personnel_report_rel_personnel_id", "personnel_id"),
+)
+
+
+# reports created before `ux_report_date_company` existed might share a date &
+# company. keep the latest edited one and move the presence of the rest into it
+def merge_duplicate_reports(connection: sqlalchemy.Connection, /) -> None:
+    report, personnel_report_rel = report_v1, personnel_report_rel_v1
+    duplicates = connection.execute(
+        sqlalchemy.select(report.c.date, report.c.company)
+        .group_by(report.c.date, report.c.company)
+        .having(sqlalchemy.func.count() > 1)
+    ).all()
+
+    for date, company in duplicates:
+        ids = connection.scalars(
+            sqlalchemy.select(report.c.id)
+            .filter(report.c.date == date)
+            .filter(report.c.company == company)
+            .order_by(report.c.last_edited.desc(), report.c.id.desc())
+        ).all()
+        keep, redundant = ids[0], ids[1:]
+
+        present = connection.scalars(
+            sqlalchemy.select(personnel_report_rel.c.personnel_id)
+            .filter(personnel_report_rel.c.report_id.in_(ids))
+            .distinct()
+        ).all()
+        connection.execute(
+            sqlalchemy.delete(personnel_report_rel).where(
+                personnel_report_rel.c.report_id.in_(ids)
+            )
+        )
+        if present:
+            connection.execute(
+                sqlalchemy.insert(personnel_report_rel),
+                [{"report_id": keep, "personnel_id": id} for id in present],
+            )
+        connection.execute(sqlalchemy.delete(report).where(report.c.id.in_(redundant)))
+        logging.warning(
+            f"merged reports {redundant} of {company} at {date} into {keep}"
+        )
+
+    connection.commit()
+
+
+def upgrade_to_1(connection: sqlalchemy.Connection, /) -> None:
+    merge_duplicate_reports(connection)
+    create_indexes(
+        (report_v1, "ux_report_date_company"),
+        (report_v1, "ix_report_company_date"),
+        (personnel_v1, "ix_personnel_company_active_last_name"),
+        (personnel_v1, "ix_personnel_company_date_added"),
+        (personnel_v1, "ix_personnel_date_added_date_removed"),
+        (personnel_report_rel_v1, "ix_personnel_report_rel_personnel_id"),
+    )(connection)
+
+
+data_version_v2 = Table(
+    "data_version",
+    metadata_v1,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+
+def upgrade_to_2(connection: sqlalchemy.Connection, /) -> None:
+    data_version_v2.create(connection, checkfirst=True)
+
+
+# the interval indexes of the service period of a personnel, one per dialect
+def service_period_indexes(personnel: Table, /) -> None:
+    columns = personnel.c
+    Index(
+        "ix_personnel_service_period",
+        sqlalchemy.func.daterange(
+            columns.date_added,
+            sqlalchemy.case(
+                (columns.date_removed < columns.date_added, columns.date_added),
+                else_=columns.date_removed,
+            ),
+            sqlalchemy.literal_column("'[]'"),
+            type_=postgresql.DATERANGE,
+        ),
+        postgresql_using="gist",
+    ).ddl_if(dialect="postgresql")
+    Index(
+        "ix_personnel_service_end_date_added",
+        sqlalchemy.func.coalesce(
+            columns.date_removed, sqlalchemy.literal_column("'9999-12-31'")
+        ),
+        columns.date_added,
+    ).ddl_if(dialect="sqlite")
+
+
+service_period_indexes(personnel_v1)
+
+personnel_history_v4 = Table(
+    "personnel_history",
+    metadata_v1,
+    Column("id", Integer, primary_key=True),
+    Column("personnel_id", String, nullable=False),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("company", String, nullable=False),
+    Column("platoon", String, nullable=False),
+    Column("valid_from", Date, nullable=False),
+    Column("valid_to", Date, nullable=True),
+    Index(
+        "ux_personnel_history_personnel_id_valid_from",
+        "personnel_id",
+        "valid_from",
+        unique=True,
+    ),
+    Index("ix_personnel_history_company_valid_from", "company", "valid_from"),
+)
+
+
+# the first version of every personnel covers its whole service. a promotion used to
+# delete & re-add its personnel, so the `date_added` of a promoted user is the day of
+# its promotion: it's moved back to the earliest report the personnel is present in,
+# or it would drop out of the rosters of the reports before it
+def upgrade_to_4(connection: sqlalchemy.Connection, /) -> None:
+    personnel_history = personnel_history_v4
+    personnel_history.create(connection, checkfirst=True)
+    personnel, history = personnel_v1, personnel_history.c
+    report, personnel_report_rel = report_v1, personnel_report_rel_v1
+    earliest = (
+        sqlalchemy.select(sqlalchemy.func.min(report.c.date))
+        .join(personnel_report_rel, personnel_report_rel.c.report_id == report.c.id)
+        .where(personnel_report_rel.c.personnel_id == personnel.c.id)
+        .scalar_subquery()
+    )
+    connection.execute(
+        sqlalchemy.update(personnel)
+        .where(earliest < personnel.c.date_added)
+        .values(date_added=earliest)
+    )
+    connection.execute(
+        sqlalchemy.insert(personnel_history).from_select(
+            [
+                "personnel_id",
+                "first_name",
+                "last_name",
+                "company",
+                "platoon",
+                "valid_from",
+            ],
+            sqlalchemy.select(
+                personnel.c.id,
+                personnel.c.first_name,
+                personnel.c.last_name,
+                personnel.c.company,
+                personnel.c.platoon,
+                personnel.c.date_added,
+            ).filter(
+                ~sqlalchemy.exists().where(history.personnel_id == personnel.c.id)
+            ),
+        )
+    )
+
+
+# the schema from version 5 to 7, company, platoon, role & type stored as codes
+metadata_v5 = sqlalchemy.MetaData()
+
+personnel_v5 = Table(
+    "personnel",
+    metadata_v5,
+    Column("id", String, primary_key=True),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("company", SmallInteger, nullable=False),
+    Column("platoon", SmallInteger, nullable=False),
+    Column("active", Boolean, nullable=False),
+    Column("date_added", Date, nullable=False),
+    Column("date_removed", Date, nullable=True),
+    Column("type", SmallInteger, nullable=False),
+    Index(
+        "ix_personnel_company_active_last_name",
+        "company",
+        "active",
+        "last_name",
+        "first_name",
+    ),
+    Index("ix_personnel_company_date_added", "company", "date_added"),
+    Index("ix_personnel_date_added_date_removed", "date_added", "date_removed"),
+)
+service_period_indexes(personnel_v5)
+
+user_v5 = Table(
+    "user",
+    metadata_v5,
+    Column("id", String, ForeignKey("personnel.id"), primary_key=True),
+    Column("email", String, nullable=False, unique=True),
+    Column("role", SmallInteger, nullable=False),
+)
+
+report_v5 = Table(
+    "report",
+    metadata_v5,
+    Column("id", Integer, primary_key=True),
+    Column("date", Date, nullable=False),
+    Column("company", SmallInteger, nullable=False),
+    Column("last_edited", DateTime, nullable=False),
+    Column("edited_by_id", String, ForeignKey("user.id"), nullable=True),
+    Index("ux_report_date_company", "date", "company", unique=True),
+    Index("ix_report_company_date", "company", "date"),
+)
+
+personnel_history_v5 = Table(
+    "personnel_history",
+    metadata_v5,
+    Column("id", Integer, primary_key=True),
+    Column("personnel_id", String, nullable=False),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("company", SmallInteger, nullable=False),
+    Column("platoon", SmallInteger, nullable=False),
+    Column("valid_from", Date, nullable=False),
+    Column("valid_to", Date, nullable=True),
+    Index(
+        "ux_personnel_history_personnel_id_valid_from",
+        "personnel_id",
+        "valid_from",
+        unique=True,
+    ),
+    Index("ix_personnel_history_company_valid_from", "company", "valid_from"),
+)
+
+# the names of every coded column by code, as they were at version 5
+COMPANIES = ("A", "B", "C", "SUPPORT", "HEADQUARTERS")
+PLATOONS = ("UNCATEGORIZED", "_1", "_2", "_3", "_4", "_5", "_6", "_7", "_8", "_9")
+ROLES = ("USER", "MANAGER", "ADMIN")
+PERSONNEL_TYPES = ("personnel", "user")
+
+CODED_COLUMNS = (
+    (
+        personnel_v5,
+        {"company": COMPANIES, "platoon": PLATOONS, "type": PERSONNEL_TYPES},
+    ),
+    (user_v5, {"role": ROLES}),
+    (report_v5, {"company": COMPANIES}),
+    (personnel_history_v5, {"company": COMPANIES, "platoon": PLATOONS}),
+)
+
+
+# sqlite can't alter the type of a column, so the coded tables are rebuilt: a copy by
+# the coded definition is filled from the table (`values` by column name), replaces
+# it & gets its indexes back. the copy is created under another name, so whatever
+# refers to the table keeps referring to it
+def rebuild(
+    connection: sqlalchemy.Connection, table: Table, values: dict[str, str], /
+) -> None:
+    quote = connection.dialect.identifier_preparer.quote
+    name, copy = quote(table.name), quote(f"{table.name}_coded")
+    ddl = str(sqlalchemy.schema.CreateTable(table).compile(dialect=connection.dialect))
+    connection.execute(
+        sqlalchemy.text(ddl.replace(f"CREATE TABLE {name}", f"CREATE TABLE {copy}", 1))
+    )
+    columns = [quote(column.name) for column in table.c]
+    selected = [values.get(column.name, quote(column.name)) for column in table.c]
+    connection.execute(
+        sqlalchemy.text(
+            f"INSERT INTO {copy} ({', '.join(columns)}) "
+            f"SELECT {', '.join(selected)} FROM {name}"
+        )
+    )
+    connection.execute(sqlalchemy.text(f"DROP TABLE {name}"))
+    connection.execute(sqlalchemy.text(f"ALTER TABLE {copy} RENAME TO {name}"))
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        if applies_to(index, connection.dialect):
+            create_index(connection, index)
+
+
+# the code of the name in `column`, NULL if it isn't one of `names`
+def to_code(column: str, names: tuple[str, ...], /) -> str:
+    whens = " ".join(f"WHEN '{name}' THEN {code}" for code, name in enumerate(names))
+    return f"CASE {column} {whens} END"
+
+
+# replaces the names stored in `CODED_COLUMNS` by their codes, converting the columns
+# to smallint: postgres alters them in place (rebuilding their indexes), sqlite
+# rebuilds their tables. a name which isn't in the set fails the migration
+def upgrade_to_5(connection: sqlalchemy.Connection, /) -> None:
+    quote = connection.dialect.identifier_preparer.quote
+    for table, coded in CODED_COLUMNS:
+        values = {name: to_code(quote(name), names) for name, names in coded.items()}
+        if not is_postgres(connection):
+            rebuild(connection, table, values)
+            continue
+
+        for name, value in values.items():
+            connection.execute(
+                sqlalchemy.text(
+                    f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(name)} "
+                    f"TYPE SMALLINT USING {value}"
+                )
+            )
+
+
+presence_summary_v6 = Table(
+    "presence_summary",
+    metadata_v5,
+    Column("date", Date, primary_key=True),
+    Column("company", SmallInteger, primary_key=True),
+    Column("platoon", SmallInteger, primary_key=True),
+    Column("present", Integer, nullable=False),
+    Column("total", Integer, nullable=False),
+)
+
+
+# whether a personnel served at the date of `report`, as `personnel.service_period`
+# puts it: from `date_added` to `date_removed`, or to `date_added` if it was removed
+# before it was added
+def served_at(personnel: Table, report: Table, /) -> sqlalchemy.ColumnElement[bool]:
+    return sqlalchemy.and_(
+        personnel.c.date_added <= report.c.date,
+        sqlalchemy.or_(
+            personnel.c.date_removed == None,  # noqa: E711
+            report.c.date
+            <= sqlalchemy.case(
+                (
+                    personnel.c.date_removed < personnel.c.date_added,
+                    personnel.c.date_added,
+                ),
+                else_=personnel.c.date_removed,
+            ),
+        ),
+    )
+
+
+# the summaries of the existing reports are counted as `summary_dal.rebuild` counts
+# them. at this version every presence is a row of `personnel_report_rel`
+def upgrade_to_6(connection: sqlalchemy.Connection, /) -> None:
+    presence_summary_v6.create(connection, checkfirst=True)
+    report, history = report_v5, personnel_history_v5.c
+    personnel, personnel_report_rel = personnel_v5, personnel_report_rel_v1
+    connection.execute(
+        sqlalchemy.insert(presence_summary_v6).from_select(
+            ["date", "company", "platoon", "present", "total"],
+            sqlalchemy.select(
+                report.c.date,
+                history.company,
+                history.platoon,
+                sqlalchemy.func.count(personnel_report_rel.c.personnel_id),
+                sqlalchemy.func.count(),
+            )
+            .select_from(report)
+            .join(
+                personnel_history_v5,
+                sqlalchemy.and_(
+                    history.company == report.c.company,
+                    history.valid_from <= report.c.date,
+                    sqlalchemy.or_(
+                        history.valid_to == None,  # noqa: E711
+                        history.valid_to >= report.c.date,
+                    ),
+                ),
+            )
+            .join(
+                personnel,
+                sqlalchemy.and_(
+                    personnel.c.id == history.personnel_id,
+                    served_at(personnel, report),
+                ),
+            )
+            .outerjoin(
+                personnel_report_rel,
+                sqlalchemy.and_(
+                    personnel_report_rel.c.report_id == report.c.id,
+                    personnel_report_rel.c.personnel_id == history.personnel_id,
+                ),
+            )
+            .filter(
+                ~sqlalchemy.exists().where(
+                    presence_summary_v6.c.date == report.c.date,
+                    presence_summary_v6.c.company == report.c.company,
+                )
+            )
+            .group_by(report.c.date, history.company, history.platoon),
+        )
+    )
+
+
+personnel_ordinal_v7 = Table(
+    "personnel_ordinal",
+    metadata_v5,
+    Column("company", SmallInteger, primary_key=True),
+    Column("ordinal", Integer, primary_key=True),
+    Column("personnel_id", String, nullable=False),
+    UniqueConstraint(
+        "company", "personnel_id", name="ux_personnel_ordinal_company_personnel_id"
+    ),
+)
+presence_bitmap_v7 = Column("presence_bitmap", LargeBinary, nullable=True)
+
+
+def upgrade_to_7(connection: sqlalchemy.Connection, /) -> None:
+    personnel_ordinal_v7.create(connection, checkfirst=True)
+    columns = sqlalchemy.inspect(connection).get_columns("report")
+    if "presence_bitmap" not in {column["name"] for column in columns}:
+        column = presence_bitmap_v7
+        connection.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE report ADD COLUMN {column.name} "
+                f"{column.type.compile(connection.dialect)}"
+            )
+        )
+
+
+# the schema from version 8, report & presence partitioned by month on postgres.
+# `personnel` & `user` are referred to by their keys only
+metadata_v8 = sqlalchemy.MetaData()
+
+Table("personnel", metadata_v8, Column("id", String, primary_key=True))
+Table("user", metadata_v8, Column("id", String, primary_key=True))
+
+report_v8 = Table(
+    "report",
+    metadata_v8,
+    Column("id", Integer, primary_key=True),
+    Column("date", Date, nullable=False),
+    Column("company", SmallInteger, nullable=False),
+    Column("last_edited", DateTime, nullable=False),
+    Column("edited_by_id", String, ForeignKey("user.id"), nullable=True),
+    Column("presence_bitmap", LargeBinary, nullable=True),
+    Index("ux_report_date_company", "date", "company", unique=True),
+    Index("ix_report_company_date", "company", "date"),
+    PrimaryKeyConstraint("id").ddl_if(dialect="sqlite"),
+    UniqueConstraint("id", "date", name="ux_report_id_date").ddl_if(
+        dialect="postgresql"
+    ),
+    postgresql_partition_by="RANGE (date)",
+)
+
+personnel_report_rel_v8 = Table(
+    "personnel_report_rel",
+    metadata_v8,
+    Column("report_id", Integer, primary_key=True),
+    Column("personnel_id", String, ForeignKey("personnel.id"), primary_key=True),
+    Column("report_date", Date, primary_key=True),
+    ForeignKeyConstraint(["report_id"], ["report.id"]).ddl_if(dialect="sqlite"),
+    ForeignKeyConstraint(
+        ["report_id", "report_date"],
+        ["report.id", "report.date"],
+        name="fk_personnel_report_rel_report",
+    ).ddl_if(dialect="postgresql"),
+    Index("ix_personnel_report_rel_personnel_id", "personnel_id"),
+    Index("ix_personnel_report_rel_report_date", "report_date").ddl_if(
+        dialect="sqlite"
+    ),
+    postgresql_partition_by="RANGE (report_date)",
+)
+
+
+# rebuilds `report` & `personnel_report_rel`, which gains the report's date: their
+# rows are copied aside, the tables recreated (partitioned on postgres, with the
+# partitions of every reported month & the next one) and the rows copied back
+def upgrade_to_8(connection: sqlalchemy.Connection, /) -> None:
+    report, rel = report_v8, personnel_report_rel_v8
+    report_columns = ", ".join(column.name for column in report.c)
+    connection.execute(
+        sqlalchemy.text(
+            f"CREATE TABLE report_copy AS SELECT {report_columns} FROM report"
+        )
+    )
+    connection.execute(
+        sqlalchemy.text(
+            "CREATE TABLE personnel_report_rel_copy AS "
+            "SELECT r.report_id, r.personnel_id, report.date AS report_date "
+            "FROM personnel_report_rel r JOIN report ON report.id = r.report_id"
+        )
+    )
+    rel.drop(connection)
+    report.drop(connection)
+    report.create(connection)
+    rel.create(connection)
+
+    if is_postgres(connection):
+        dates = connection.scalars(
+            sqlalchemy.text("SELECT DISTINCT date FROM report_copy")
+        ).all()
+        today = partitions.month_of(datetime.date.today())
+        months = {partitions.month_of(date) for date in dates}
+        for month in months | {today, partitions.next_month(today)}:
+            partitions.create(connection, month)
+
+    connection.execute(
+        sqlalchemy.text(
+            f"INSERT INTO report ({report_columns}) "
+            f"SELECT {report_columns} FROM report_copy"
+        )
+    )
+    connection.execute(
+        sqlalchemy.text(
+            "INSERT INTO personnel_report_rel (report_id, personnel_id, report_date) "
+            "SELECT report_id, personnel_id, report_date FROM personnel_report_rel_copy"
+        )
+    )
+    if is_postgres(connection):
+        connection.execute(
+            sqlalchemy.text(
+                "SELECT setval(pg_get_serial_sequence('report', 'id'), "
+                "coalesce(max(id), 0) + 1, false) FROM report"
+            )
+        )
+    connection.execute(sqlalchemy.text("DROP TABLE personnel_report_rel_copy"))
+    connection.execute(sqlalchemy.text("DROP TABLE report_copy"))
+
+
+report_archive_v9 = Table(
+    "report_archive",
+    metadata_v8,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("date", Date, nullable=False),
+    Column("company", SmallInteger, nullable=False),
+    Column("last_edited", DateTime, nullable=False),
+    Column("edited_by_id", String, nullable=True),
+    Column("presence", LargeBinary, nullable=False),
+)
+
+
+def upgrade_to_9(connection: sqlalchemy.Connection, /) -> None:
+    report_archive_v9.create(connection, checkfirst=True)
+
+
+# repoints `report.edited_by_id` from `user` to `personnel`, so demoting the editor of
+# a report keeps it. sqlite can't alter a constraint (and doesn't enforce it), so
+# there the old one is left in place
+def upgrade_to_10(connection: sqlalchemy.Connection, /) -> None:
+    if not is_postgres(connection):
+        return
+
+    quote = connection.dialect.identifier_preparer.quote
+    foreign_keys = sqlalchemy.inspect(connection).get_foreign_keys("report")
+    for foreign_key in foreign_keys:
+        if foreign_key["constrained_columns"] == ["edited_by_id"] and (
+            foreign_key["referred_table"] == "user"
+        ):
+            connection.execute(
+                sqlalchemy.text(
+                    f"ALTER TABLE report DROP CONSTRAINT {quote(foreign_key['name'])}"
+                )
+            )
+    if not any(
+        foreign_key["constrained_columns"] == ["edited_by_id"]
+        and foreign_key["referred_table"] == "personnel"
+        for foreign_key in foreign_keys
+    ):
+        connection.execute(
+            sqlalchemy.text(
+                "ALTER TABLE report ADD CONSTRAINT report_edited_by_id_fkey "
+                "FOREIGN KEY (edited_by_id) REFERENCES personnel (id)"
+            )
+        )
+
+
+# the schema from version 11, the archive read by date & company
+metadata_v11 = sqlalchemy.MetaData()
+
+report_archive_v11 = Table(
+    "report_archive",
+    metadata_v11,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("date", Date, nullable=False),
+    Column("company", SmallInteger, nullable=False),
+    Column("last_edited", DateTime, nullable=False),
+    Column("edited_by_id", String, nullable=True),
+    Column("presence", LargeBinary, nullable=False),
+    Index("ix_report_archive_date_company", "date", "company"),
+)
+
+
+# the schema from version 12, a report marked once it's submitted. only the columns
+# the migration reads
+metadata_v12 = sqlalchemy.MetaData()
+
+report_v12 = Table(
+    "report",
+    metadata_v12,
+    Column("id", Integer, primary_key=True),
+    Column("date", Date, nullable=False),
+    Column("presence_bitmap", LargeBinary, nullable=True),
+    Column("submitted", Boolean, nullable=False, server_default=sqlalchemy.false()),
+)
+
+
+# marks the reports holding presence as submitted. an empty one can't be told apart
+# from a report opened but never submitted (as a report used to be created when its
+# page was opened), so it's left unmarked for the purge of the empty reports
+def upgrade_to_12(connection: sqlalchemy.Connection, /) -> None:
+    report, rel = report_v12, personnel_report_rel_v8
+    columns = sqlalchemy.inspect(connection).get_columns("report")
+    if "submitted" not in {column["name"] for column in columns}:
+        column = sqlalchemy.schema.CreateColumn(report.c.submitted).compile(
+            dialect=connection.dialect
+        )
+        connection.execute(sqlalchemy.text(f"ALTER TABLE report ADD COLUMN {column}"))
+    connection.execute(
+        sqlalchemy.update(report)
+        .where(
+            sqlalchemy.or_(
+                report.c.presence_bitmap.is_not(None),
+                sqlalchemy.exists().where(
+                    rel.c.report_id == report.c.id, rel.c.report_date == report.c.date
+                ),
+            )
+        )
+        .values(submitted=True)
+    )
+
+
+# the schema from version 13, a data version carries the epoch of its row
+metadata_v13 = sqlalchemy.MetaData()
+
+data_version_v13 = Table(
+    "data_version",
+    metadata_v13,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("epoch", String, nullable=True),
+)
+
+
+# the existing versions get an epoch of their own, so the roster snapshots built
+# before it are rebuilt
+def upgrade_to_13(connection: sqlalchemy.Connection, /) -> None:
+    columns = sqlalchemy.inspect(connection).get_columns("data_version")
+    if "epoch" not in {column["name"] for column in columns}:
+        column = sqlalchemy.schema.CreateColumn(data_version_v13.c.epoch).compile(
+            dialect=connection.dialect
+        )
+        connection.execute(
+            sqlalchemy.text(f"ALTER TABLE data_version ADD COLUMN {column}")
+        )
+    connection.execute(
+        sqlalchemy.update(data_version_v13)
+        .where(data_version_v13.c.epoch.is_(None))
+        .values(epoch=secrets.token_hex(8))
+    )
+
+
+# append only. never edit or reorder a migration which has been released
+MIGRATIONS = [
+    Migration(
+        1,
+        "composite indexes for the personnel & report hot filters",
+        upgrade_to_1,
+    ),
+    Migration(2, "data versions for the in-process caches", upgrade_to_2),
+    Migration(
+        3,
+        "an interval index on the service period of the personnel",
+        create_indexes(
+            (personnel_v1, "ix_personnel_service_period"),
+            (personnel_v1, "ix_personnel_service_end_date_added"),
+        ),
+    ),
+    Migration(4, "the personnel history", upgrade_to_4),
+    Migration(
+        5, "company, platoon, role & type stored as small integer codes", upgrade_to_5
+    ),
+    Migration(6, "the daily presence summary", upgrade_to_6),
+    Migration(7, "presence bitmaps over per company personnel ordinals", upgrade_to_7),
+    Migration(8, "report & presence partitioned by month", upgrade_to_8),
+    Migration(9, "the archive of the reports of closed months", upgrade_to_9),
+    Migration(10, "the editor of a report references its personnel", upgrade_to_10),
+    Migration(
+        11,
+        "a date & company index on the archive",
+        create_indexes((report_archive_v11, "ix_report_archive_date_company")),
+    ),
+    Migration(12, "reports marked once submitted", upgrade_to_12),
+    Migration(13, "an epoch per data version", upgrade_to_13),
+]
+
+
+def current_version(connection: sqlalchemy.Connection, /) -> int:
+    schema_migration.create(connection, checkfirst=True)
+    connection.commit()
+    return (
+        connection.scalar(
+            sqlalchemy.select(sqlalchemy.func.max(schema_migration.c.version))
+        )
+        or 0
+    )
+
+
+def record(connection: sqlalchemy.Connection, migration: Migration, /) -> None:
+    connection.execute(
+        sqlalchemy.insert(schema_migration).values(
+            version=migration.version, description=migration.description
+        )
+    )
+    connection.commit()
+
+
+def upgrade(engine: sqlalchemy.Engine, /) -> list[Migration]:
+    applied = []
+    with engine.connect() as connection:
+        version = current_version(connection)
+        for migration in MIGRATIONS:
+            if migration.version <= version:
+                continue
+
+            migration.upgrade(connection)
+            connection.commit()
+            record(connection, migration)
+            applied.append(migration)
+    return applied
+
+
+# marks every migration as applied without running it
+def stamp(engine: sqlalchemy.Engine, /) -> None:
+    with engine.connect() as connection:
+        version = current_version(connection)
+        for migration in MIGRATIONS:
+            if migration.version > version:
+                record(connection, migration)
+
+
+# the names of the indexes of `table`. unlike the inspector this includes the
+# expression based indexes
+def index_names(connection: sqlalchemy.Connection, table: Table, /) -> set[str]:
+    statement = (
+        "SELECT indexname FROM pg_indexes WHERE tablename = :name"
+        if is_postgres(connection)
+        else "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name"
+    )
+    return set(
+        connection.scalars(sqlalchemy.text(statement), {"name": table.name}).all()
+    )
+
+
+def missing_indexes(engine: sqlalchemy.Engine, /) -> list[sqlalchemy.Index]:
+    missing = []
+    with engine.connect() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = index_names(connection, table)
+            missing.extend(
+                index
+                for index in sorted(table.indexes, key=lambda index: index.name)
+                if index.name not in existing
+                and applies_to(index, connection.dialect)
+            )
+    return missing
@@ -90,3 +90,10 @@ class Presence(Enum):
     @staticmethod
     def is_valid(presence: str, /) -> bool:
         return presence in Presence._member_names_
+
+
+# the label of every member, by its name. rendering a roster is then a dict lookup per
+# row rather than an enum lookup
+ROLE_LABELS = {member.name: member.value.name for member in Role}
+COMPANY_LABELS = {member.name: member.value for member in Company}
+PLATOON_LABELS = {member.name: member.value for member in Platoon}
@@ -0,0 +1,96 @@
+import datetime
+import sqlalchemy
+from sqlalchemy import Table
+from onereport.data.report import Report
+from onereport.data.personnel_to_report import personnel_report_rel
+
+# on postgres `report` & `personnel_report_rel` are partitioned by the month of the
+# report's date, a partition per table per month named `<table>_y<year>m<month>`.
+# a query of recent dates only scans the partitions of their months and an old month
+# is retired by detaching its partitions. sqlite has no partitions, there a month is
+# merely a range of the date leading indexes
+PARTITIONED = (Report.__table__, personnel_report_rel)
+
+# anything a connection or a session can execute on
+Executor = sqlalchemy.Connection | sqlalchemy.orm.Session
+
+
+def month_of(date: datetime.date, /) -> datetime.date:
+    return date.replace(day=1)
+
+
+def next_month(month: datetime.date, /) -> datetime.date:
+    return (month.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+# the first of the month `count` months before `month`
+def months_before(month: datetime.date, count: int, /) -> datetime.date:
+    index = month.year * 12 + month.month - 1 - count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def name(table: Table, month: datetime.date, /) -> str:
+    return f"{table.name}_y{month.year}m{month.month:02d}"
+
+
+# the months whose partitions are attached to `report`
+def months(executor: Executor, /) -> list[datetime.date]:
+    names = executor.scalars(
+        sqlalchemy.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+        ),
+        {"table": Report.__table__.name},
+    ).all()
+    return sorted(
+        datetime.date(int(partition[-7:-3]), int(partition[-2:]), 1)
+        for partition in names
+    )
+
+
+def exists(executor: Executor, month: datetime.date, /) -> bool:
+    return all(
+        executor.scalar(
+            sqlalchemy.text("SELECT to_regclass(:name) IS NOT NULL"),
+            {"name": name(table, month)},
+        )
+        for table in PARTITIONED
+    )
+
+
+# creates the partitions of `month` unless they exist. a postgres only DDL
+def create(executor: Executor, month: datetime.date, /) -> None:
+    for table in PARTITIONED:
+        executor.execute(
+            sqlalchemy.text(
+                f"CREATE TABLE IF NOT EXISTS {name(table, month)} "
+                f"PARTITION OF {table.name} "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+            )
+        )
+
+
+# detaches the partitions of `month`, leaving them as standalone tables with no
+# foreign keys, then drops them if `drop`. the presence goes first as it refers to
+# its reports. a postgres only DDL
+def detach(executor: Executor, month: datetime.date, /, drop: bool = False) -> None:
+    for table in reversed(PARTITIONED):
+        partition = name(table, month)
+        executor.execute(
+            sqlalchemy.text(f"ALTER TABLE {table.name} DETACH PARTITION {partition}")
+        )
+        for constraint in executor.scalars(
+            sqlalchemy.text(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = to_regclass(:name) AND contype = 'f'"
+            ),
+            {"name": partition},
+        ).all():
+            executor.execute(
+                sqlalchemy.text(
+                    f'ALTER TABLE {partition} DROP CONSTRAINT "{constraint}"'
+                )
+            )
+        if drop:
+            executor.execute(sqlalchemy.text(f"DROP TABLE {partition}"))
@@ -1,30 +1,51 @@
+import sqlalchemy
 import sqlalchemy.orm as orm
+from sqlalchemy import Index
+from sqlalchemy.dialects import postgresql
 from datetime import date
 from typing import Optional, Self, Set
 from onereport.data.base import db
+from onereport.data.coded import COMPANY, PLATOON, PERSONNEL_TYPE
 from onereport.data.personnel_to_report import personnel_report_rel
 
 
 class Personnel(db.Model):
     __tablename__ = "personnel"
+    # match the access paths of personnel_dal. see data/migrations.py for existing databases
+    __table_args__ = (
+        Index(
+            "ix_personnel_company_active_last_name",
+            "company",
+            "active",
+            "last_name",
+            "first_name",
+        ),
+        Index("ix_personnel_company_date_added", "company", "date_added"),
+        Index("ix_personnel_date_added_date_removed", "date_added", "date_removed"),
+    )
 
     id: orm.Mapped[str] = orm.mapped_column(primary_key=True)
     first_name: orm.Mapped[str]
     last_name: orm.Mapped[str]
-    company: orm.Mapped[str]
-    platoon: orm.Mapped[str]
+    company: orm.Mapped[str] = orm.mapped_column(COMPANY)
+    platoon: orm.Mapped[str] = orm.mapped_column(PLATOON)
     active: orm.Mapped[bool] = orm.mapped_column(default=True)
     date_added: orm.Mapped[date] = orm.mapped_column(default=date.today)
     date_removed: orm.Mapped[Optional[date]] = orm.mapped_column(default=None)
 
-    type: orm.Mapped[str]
+    type: orm.Mapped[str] = orm.mapped_column(PERSONNEL_TYPE)
     __mapper_args__ = {
         "polymorphic_identity": "personnel",
         "polymorphic_on": "type",
     }
 
     dates_present: orm.Mapped[Set["Report"]] = orm.relationship(  # noqa: F821 # type: ignore
-        secondary=personnel_report_rel, back_populates="presence", lazy=True
+        secondary=personnel_report_rel,
+        primaryjoin="Personnel.id == personnel_report_rel.c.personnel_id",
+        secondaryjoin="Report.id == personnel_report_rel.c.report_id",
+        back_populates="presence",
+        lazy=True,
+        viewonly=True,
     )
 
     def __init__(
@@ -59,3 +80,36 @@ class Personnel(db.Model):
 
     def __repr__(self: Self) -> str:
         return f"Personnel(id: {self.id}, full name:{' '.join((self.first_name, self.last_name))}, company: {self.company}, platoon: {self.platoon}, active: {self.active})"
+
+
+# the service period of a personnel, from `date_added` to `date_removed` (inclusive,
+# unbounded while it's still serving). the dal filters by the very same expressions
+# the indexes below are built on, otherwise the planner won't use them. a
+# `date_removed` before `date_added` is clamped, as postgres rejects such a range
+def service_period() -> sqlalchemy.ColumnElement:
+    return sqlalchemy.func.daterange(
+        Personnel.date_added,
+        sqlalchemy.case(
+            (Personnel.date_removed < Personnel.date_added, Personnel.date_added),
+            else_=Personnel.date_removed,
+        ),
+        sqlalchemy.literal_column("'[]'"),
+        type_=postgresql.DATERANGE,
+    )
+
+
+# sqlite has no range type. the last day of service (the far future while serving)
+# leads an expression index instead
+def service_end() -> sqlalchemy.ColumnElement:
+    return sqlalchemy.func.coalesce(
+        Personnel.date_removed, sqlalchemy.literal_column("'9999-12-31'")
+    )
+
+
+# an interval containment probe of the gist index on postgres
+Index(
+    "ix_personnel_service_period", service_period(), postgresql_using="gist"
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_personnel_service_end_date_added", service_end(), Personnel.date_added
+).ddl_if(dialect="sqlite")
@@ -0,0 +1,27 @@
+from sqlalchemy import Table, Column, Index, Integer, String, Date
+from onereport.data.base import Base
+from onereport.data.coded import COMPANY, PLATOON
+
+# a version of the attributes of a personnel per period (a slowly changing
+# dimension): `valid_from` to `valid_to` inclusive, NULL while it's the current one.
+# past reports are rendered by the version which held at their date. there's no
+# foreign key, the history outlives the personnel. see `dal/history.py`
+personnel_history = Table(
+    "personnel_history",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("personnel_id", String, nullable=False),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("company", COMPANY, nullable=False),
+    Column("platoon", PLATOON, nullable=False),
+    Column("valid_from", Date, nullable=False),
+    Column("valid_to", Date, nullable=True),
+    Index(
+        "ux_personnel_history_personnel_id_valid_from",
+        "personnel_id",
+        "valid_from",
+        unique=True,
+    ),
+    Index("ix_personnel_history_company_valid_from", "company", "valid_from"),
+)
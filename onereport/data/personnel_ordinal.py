@@ -0,0 +1,17 @@
+from sqlalchemy import Table, Column, Integer, String, UniqueConstraint
+from onereport.data.base import Base
+from onereport.data.coded import COMPANY
+
+# a stable position of a personnel within a company: its bit in the presence bitmaps
+# of the reports of that company. assigned on first use & only released (its bit
+# cleared from every bitmap) when the personnel is deleted
+personnel_ordinal = Table(
+    "personnel_ordinal",
+    Base.metadata,
+    Column("company", COMPANY, primary_key=True),
+    Column("ordinal", Integer, primary_key=True),
+    Column("personnel_id", String, nullable=False),
+    UniqueConstraint(
+        "company", "personnel_id", name="ux_personnel_ordinal_company_personnel_id"
+    ),
+)
@@ -1,9 +1,34 @@
-from sqlalchemy import Table, ForeignKey, Column
+from sqlalchemy import (
+    Table,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Column,
+    Date,
+    Index,
+    Integer,
+)
 from onereport.data.base import Base
 
+# partitioned by month alongside `report` on postgres (see `data/partitions.py`).
+# `report_date` is the date of the report, the partition key, which postgres requires
+# in the primary key & the foreign key to `report`
 personnel_report_rel = Table(
     "personnel_report_rel",
     Base.metadata,
-    Column("report_id", ForeignKey("report.id"), primary_key=True),
+    Column("report_id", Integer, primary_key=True),
     Column("personnel_id", ForeignKey("personnel.id"), primary_key=True),
+    Column("report_date", Date, primary_key=True),
+    ForeignKeyConstraint(["report_id"], ["report.id"]).ddl_if(dialect="sqlite"),
+    ForeignKeyConstraint(
+        ["report_id", "report_date"],
+        ["report.id", "report.date"],
+        name="fk_personnel_report_rel_report",
+    ).ddl_if(dialect="postgresql"),
+    # the primary key covers lookups by report, this one covers lookups by personnel
+    Index("ix_personnel_report_rel_personnel_id", "personnel_id"),
+    # on sqlite a month is retired by a range delete over this one
+    Index("ix_personnel_report_rel_report_date", "report_date").ddl_if(
+        dialect="sqlite"
+    ),
+    postgresql_partition_by="RANGE (report_date)",
 )
@@ -0,0 +1,16 @@
+from sqlalchemy import Table, Column, Integer, Date
+from onereport.data.base import Base
+from onereport.data.coded import COMPANY, PLATOON
+
+# the number of `present` personnel out of the `total` who served in a platoon at the
+# date of a (submitted) report. kept up to date by the report submissions, see
+# `dal/summary_dal.py`
+presence_summary = Table(
+    "presence_summary",
+    Base.metadata,
+    Column("date", Date, primary_key=True),
+    Column("company", COMPANY, primary_key=True),
+    Column("platoon", PLATOON, primary_key=True),
+    Column("present", Integer, nullable=False, default=0),
+    Column("total", Integer, nullable=False, default=0),
+)
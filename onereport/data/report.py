@@ -1,26 +1,61 @@
+import sqlalchemy
 import sqlalchemy.orm as orm
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, PrimaryKeyConstraint, UniqueConstraint
 from typing import Optional, Self, Set
 import datetime
 from onereport.data.base import db
+from onereport.data.coded import COMPANY
 from onereport.data.personnel_to_report import personnel_report_rel
 from onereport.data.user import User
 from onereport.data.personnel import Personnel
 
 
 class Report(db.Model):
+    # at most one report per company per day. also serves the date & company lookups.
+    # on postgres the table is partitioned by month (see `data/partitions.py`), and
+    # a partitioned table's unique constraints must include the partition key, so
+    # there `id` is unique alongside `date` rather than a primary key
+    __table_args__ = (
+        Index("ux_report_date_company", "date", "company", unique=True),
+        Index("ix_report_company_date", "company", "date"),
+        PrimaryKeyConstraint("id").ddl_if(dialect="sqlite"),
+        UniqueConstraint("id", "date", name="ux_report_id_date").ddl_if(
+            dialect="postgresql"
+        ),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+
     id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
     date: orm.Mapped[datetime.date] = orm.mapped_column(default=datetime.date.today)
-    company: orm.Mapped[str]
+    company: orm.Mapped[str] = orm.mapped_column(COMPANY)
     last_edited: orm.Mapped[datetime.datetime] = orm.mapped_column(
         default=datetime.datetime.now
     )
 
-    edited_by_id: orm.Mapped[Optional[str]] = orm.mapped_column(ForeignKey("user.id"))
+    # points at the personnel row so demoting the editor keeps it. the relationship
+    # only resolves while the editor is still a user
+    edited_by_id: orm.Mapped[Optional[str]] = orm.mapped_column(
+        ForeignKey("personnel.id")
+    )
     edited_by: orm.Mapped[Optional["User"]] = orm.relationship()
 
+    # the presence of a report is stored either here (the association table layout) or
+    # in `presence_bitmap` (the bitmap layout, see `dal/bitmap.py`), by the
+    # `PRESENCE_STORAGE` in use when it was last submitted. `report_dal` reads & writes
+    # both, the relationship is read only as its rows carry the report's date
     presence: orm.Mapped[Set["Personnel"]] = orm.relationship(
-        secondary=personnel_report_rel, back_populates="dates_present", lazy=True
+        secondary=personnel_report_rel,
+        primaryjoin="Report.id == personnel_report_rel.c.report_id",
+        secondaryjoin="Personnel.id == personnel_report_rel.c.personnel_id",
+        back_populates="dates_present",
+        lazy=True,
+        viewonly=True,
+    )
+    presence_bitmap: orm.Mapped[Optional[bytes]] = orm.mapped_column(default=None)
+    # set by the first submission. only the empty reports which were never submitted
+    # are purged, a submission with nobody present is kept
+    submitted: orm.Mapped[bool] = orm.mapped_column(
+        default=False, server_default=sqlalchemy.false()
     )
 
     def __init__(self: Self, company: str, user: User, /) -> None:
@@ -29,7 +64,6 @@ class Report(db.Model):
     def __repr__(self: Self) -> str:
         return f"Report(date: {self.date.day}/{self.date.month}/{self.date.year}, company: {self.company})"
 
-    def update(self: Self, presence: set[Personnel], user: User, /) -> None:
-        self.presence = presence
+    def touch(self: Self, user: User, /) -> None:
         self.edited_by = user
         self.last_edited = datetime.datetime.now()
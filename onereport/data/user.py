@@ -2,6 +2,7 @@ import sqlalchemy.orm as orm
 from sqlalchemy import ForeignKey
 from flask_login import UserMixin
 from typing import Self
+from onereport.data.coded import ROLE
 from onereport.data.personnel import Personnel
 
 
@@ -12,7 +13,7 @@ class User(Personnel, UserMixin):
         ForeignKey("personnel.id"), primary_key=True
     )
     email: orm.Mapped[str] = orm.mapped_column(unique=True)
-    role: orm.Mapped[str]
+    role: orm.Mapped[str] = orm.mapped_column(ROLE)
 
     __mapper_args__ = {
         "polymorphic_identity": "user",
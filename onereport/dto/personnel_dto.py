@@ -1,15 +1,19 @@
 from typing import Self
+from sqlalchemy import Row
 from onereport.data import misc
 from onereport.data import Personnel, User
 
 
 class PersonnelDTO:
-    def __init__(self: Self, personnel: Personnel) -> None:
+    __slots__ = ("id", "first_name", "last_name", "company", "platoon", "active")
+
+    # `personnel` is either an entity or a row of `personnel_dal.ROW_COLUMNS`
+    def __init__(self: Self, personnel: Personnel | Row) -> None:
         self.id = personnel.id
         self.first_name = personnel.first_name
         self.last_name = personnel.last_name
-        self.company = misc.Company[personnel.company].value
-        self.platoon = misc.Platoon[personnel.platoon].value
+        self.company = misc.COMPANY_LABELS[personnel.company]
+        self.platoon = misc.PLATOON_LABELS[personnel.platoon]
         self.active = personnel.active
         
     @staticmethod
@@ -1,15 +1,16 @@
 import datetime
 from typing import Self
-from onereport.data import misc, Report, Personnel
+from sqlalchemy import Row
+from onereport.data import misc, ArchivedReport, Report
 from onereport.dto.personnel_dto import PersonnelDTO
 from onereport.dto.user_dto import UserDTO
 
 class ReportDTO():
-  def __init__(self: Self, report: Report, personnel: list[Personnel], /) -> None:
+  def __init__(self: Self, report: Report | ArchivedReport, personnel: list[Row], presence: set[str], /) -> None:
     self.id = report.id
     self.date = report.date
-    self.company = misc.Company[report.company].value
-    self.presence = [(PersonnelDTO(p), p in report.presence) for p in personnel] 
+    self.company = misc.COMPANY_LABELS[report.company]
+    self.presence = [(PersonnelDTO(p), p.id in presence) for p in personnel]
     self.edited_by = UserDTO(report.edited_by) if report.edited_by else ""
     self.last_edited = report.last_edited
     
@@ -19,7 +20,7 @@ class ReportDTO():
   
   
 class UnifiedReportDTO():
-  def __init__(self: Self, date: datetime.date, presence: set[Personnel], personnel: list[Personnel], /) -> None:
+  def __init__(self: Self, date: datetime.date, personnel: list[Row], presence: set[str], /) -> None:
     self.date = date
-    self.presence = [(PersonnelDTO(p), p in presence) for p in personnel]
+    self.presence = [(PersonnelDTO(p), p.id in presence) for p in personnel]
     
\ No newline at end of file
@@ -1,15 +1,28 @@
 from typing import Self
+from sqlalchemy import Row
 from onereport.data import misc
 from onereport.data import User
 
 
 class UserDTO:
-    def __init__(self: Self, user: User) -> None:
+    __slots__ = (
+        "id",
+        "first_name",
+        "last_name",
+        "email",
+        "role",
+        "company",
+        "platoon",
+        "active",
+    )
+
+    # `user` is either an entity or a row of `user_dal.ROW_COLUMNS`
+    def __init__(self: Self, user: User | Row) -> None:
         self.id = user.id
         self.first_name = user.first_name
         self.last_name = user.last_name
         self.email = user.email
-        self.role = misc.Role[user.role].value.name
-        self.company = misc.Company[user.company].value
-        self.platoon = misc.Platoon[user.platoon].value
+        self.role = misc.ROLE_LABELS[user.role]
+        self.company = misc.COMPANY_LABELS[user.company]
+        self.platoon = misc.PLATOON_LABELS[user.platoon]
         self.active = user.active
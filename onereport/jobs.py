@@ -0,0 +1,52 @@
+import time
+import threading
+from typing import Callable
+import flask
+from flask import current_app
+from onereport.dal import report_dal
+
+# in-process periodic jobs, each on a daemon thread. every (gunicorn) worker runs its
+# own, so a job must be idempotent & safe to run concurrently with itself
+
+
+def every(
+    app: flask.Flask, interval: float, job: Callable[[], None], /
+) -> threading.Thread:
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    job()
+                except Exception as e:
+                    app.logger.error(f"job {job.__name__} failed: {e}")
+
+    thread = threading.Thread(target=run, name=f"job-{job.__name__}", daemon=True)
+    thread.start()
+    return thread
+
+
+def purge_empty_reports() -> None:
+    deleted = report_dal.delete_all_empty_reports()
+    if deleted:
+        current_app.logger.info(f"purged {deleted} empty reports")
+
+
+# the jobs start with the first request a process serves, so the CLI commands don't
+# run them, and neither does a gunicorn master which forks its workers after loading
+# the app (threads don't survive a fork)
+def start(app: flask.Flask, /) -> None:
+    interval = app.config.get("EMPTY_REPORTS_PURGE_INTERVAL", 0)
+    if interval <= 0:
+        return
+
+    lock, started = threading.Lock(), threading.Event()
+
+    @app.before_request
+    def start_jobs() -> None:
+        if started.is_set():
+            return
+        with lock:
+            if not started.is_set():
+                every(app, interval, purge_empty_reports)
+                started.set()
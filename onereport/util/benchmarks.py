@@ -0,0 +1,229 @@
+import sys
+import time
+import random
+import logging
+import datetime
+import flask
+import sqlalchemy
+from onereport.data import db, Personnel, User, Report
+from onereport.data import misc
+from onereport.data.personnel_to_report import personnel_report_rel
+from onereport.data.personnel_ordinal import personnel_ordinal
+from onereport.dal import bitmap, partition_dal, report_dal
+
+
+class StatementCounter:
+    """
+    counts the statements issued against an engine & the rows they wrote into a given table
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine, table: str, /) -> None:
+        self.table = table
+        self.statements = 0
+        self.rows_written = 0
+        sqlalchemy.event.listen(engine, "after_cursor_execute", self.on_execute)
+
+    def on_execute(
+        self, conn, cursor, statement: str, params, context, executemany: bool
+    ) -> None:
+        self.statements += 1
+        if (
+            statement.lstrip().upper().startswith(("INSERT", "DELETE", "UPDATE"))
+            and self.table in statement
+        ):
+            self.rows_written += max(cursor.rowcount, 0)
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.rows_written = 0
+
+
+def create_app(uri: str, /) -> flask.Flask:
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    db.init_app(app)
+    return app
+
+
+def seed_company(company: str, size: int, /) -> tuple[User, list[Personnel]]:
+    user = User(
+        f"{company}000000",
+        f"clerk@{company}.demo",
+        "clerk",
+        "clerk",
+        "USER",
+        company,
+        "_1",
+    )
+    personnel = [
+        Personnel(
+            f"{company}{i:06d}", f"first{i}", f"last{i}", company, f"_{i % 9 + 1}"
+        )
+        for i in range(1, size)
+    ]
+    db.session.add(user)
+    db.session.add_all(personnel)
+    db.session.commit()
+    return user, [user, *personnel]
+
+
+def submissions(
+    personnel: list[Personnel], count: int, churn: float, /
+) -> list[set[str]]:
+    # the first submission marks everyone as present, every resubmission flips `churn` of the roster
+    presence = {p.id for p in personnel}
+    result = [set(presence)]
+    for _ in range(count - 1):
+        for p in random.sample(personnel, max(1, int(len(personnel) * churn))):
+            presence ^= {p.id}
+        result.append(set(presence))
+    return result
+
+
+def bench_presence_update(
+    uri: str, /, size: int = 300, submits: int = 5, churn: float = 0.05
+) -> None:
+    app = create_app(uri)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        counter = StatementCounter(db.engine, personnel_report_rel.name)
+
+        for path, company in (("table", "A"), ("bitmap", "B")):
+            app.config["PRESENCE_STORAGE"] = path
+            user, personnel = seed_company(company, size)
+
+            report = Report(company, user)
+            report_dal.save(report)
+
+            for i, presence in enumerate(
+                submissions(personnel, submits, churn), start=1
+            ):
+                report = db.session.get(Report, report.id)
+                counter.reset()
+                start = time.perf_counter()
+
+                report_dal.update(report, presence, user)
+
+                elapsed = (time.perf_counter() - start) * 1000
+                print(
+                    f"{path:<10} submit {i}: {counter.rows_written:>4} rows written, "
+                    f"{counter.statements:>3} statements, {elapsed:7.2f}ms"
+                )
+
+        db.drop_all()
+
+
+# the bytes `table` (its indexes included) takes on disk
+def table_size(table: sqlalchemy.Table, /) -> int:
+    if db.engine.dialect.name == "postgresql":
+        statement = sqlalchemy.text("SELECT pg_total_relation_size(:table)")
+    else:
+        statement = sqlalchemy.text(
+            "SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name IN "
+            "(SELECT name FROM sqlite_master WHERE tbl_name = :table)"
+        )
+    return db.session.scalar(statement, {"table": table.name})
+
+
+def timed(query, repeat: int, /) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = query()
+    return (time.perf_counter() - start) * 1000 / repeat, len(result)
+
+
+# the same daily presence of two equal companies, one stored in the association
+# table & one as bitmaps: the storage each takes & the latency of union, intersection
+# & "present at least n of m days" queries over it
+def bench_presence_storage(
+    uri: str, /, size: int = 300, days: int = 365, rate: float = 0.8, repeat: int = 5
+) -> None:
+    app = create_app(uri)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        end = datetime.date.today()
+        start = end - datetime.timedelta(days=days - 1)
+
+        for storage, company in (("table", "A"), ("bitmap", "B")):
+            user, personnel = seed_company(company, size)
+            ordinals = bitmap.ordinals(misc.Company[company], {p.id for p in personnel})
+            for day in range(days):
+                report = Report(company, user)
+                report.date = start + datetime.timedelta(days=day)
+                partition_dal.ensure(report.date)
+                presence = {p.id for p in personnel if random.random() < rate}
+                if storage == "bitmap":
+                    report.presence_bitmap = bitmap.encode(
+                        bitmap.from_ordinals(ordinals[id] for id in presence)
+                    )
+                    db.session.add(report)
+                    continue
+
+                db.session.add(report)
+                db.session.flush()
+                db.session.execute(
+                    sqlalchemy.insert(personnel_report_rel),
+                    [
+                        {
+                            "report_id": report.id,
+                            "personnel_id": id,
+                            "report_date": report.date,
+                        }
+                        for id in presence
+                    ],
+                )
+            db.session.commit()
+
+        bitmaps = db.session.scalar(
+            sqlalchemy.select(
+                sqlalchemy.func.sum(sqlalchemy.func.length(Report.presence_bitmap))
+            )
+        )
+        print(f"table  storage: {table_size(personnel_report_rel):>10} bytes")
+        print(
+            f"bitmap storage: {bitmaps + table_size(personnel_ordinal):>10} bytes "
+            f"({bitmaps} of bitmaps)"
+        )
+
+        window = end - datetime.timedelta(days=29)
+        for storage, company in (("table", misc.Company.A), ("bitmap", misc.Company.B)):
+            queries = {
+                "union": lambda: report_dal.find_all_ids_present_in_any(
+                    company, start, end
+                ),
+                "intersection": lambda: report_dal.find_all_ids_present_in_all(
+                    company, window, end
+                ),
+                "at least 20 of 30": lambda: report_dal.find_all_ids_present_at_least(
+                    company, 20, window, end
+                ),
+            }
+            for name, query in queries.items():
+                elapsed, found = timed(query, repeat)
+                print(
+                    f"{storage:<6} {name:<17}: {found:>4} personnel, {elapsed:8.2f}ms"
+                )
+
+        db.drop_all()
+
+
+BENCHMARKS = {
+    "presence_update": bench_presence_update,
+    "presence_storage": bench_presence_storage,
+}
+
+
+def main() -> None:
+    argv = sys.argv
+    if len(argv) < 2 or argv[1] not in BENCHMARKS:
+        logging.error(f"Usage: {argv[0]} <{'|'.join(BENCHMARKS)}> [database uri]")
+        exit(1)
+
+    uri = argv[2] if len(argv) > 2 else "sqlite://"
+    BENCHMARKS[argv[1]](uri)
+
+
+if __name__ == "__main__":
+    main()
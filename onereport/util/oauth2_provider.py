@@ -0,0 +1,109 @@
+import sys
+import json
+import time
+import hashlib
+import logging
+import secrets
+import urllib.parse as urllib_parse
+import flask
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from markupsafe import escape
+
+# a stand-in for an OpenID Connect provider, to log in locally without google. point
+# GOOGLE_AUTHORIZE_URL, GOOGLE_TOKEN_URL, GOOGLE_JWKS_URI, GOOGLE_USERINFO_URL &
+# GOOGLE_ISSUERS at it. NEVER use it in production: whoever reaches it may log in as
+# anyone
+
+
+def create_app(issuer: str, /) -> flask.Flask:
+    app = flask.Flask(__name__)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    kid = secrets.token_hex(8)
+    codes: dict[str, dict] = {}
+    tokens: dict[str, str] = {}
+
+    @app.get("/authorize")
+    def authorize():
+        args = flask.request.args
+        email = args.get("email")
+        if not email:
+            hidden = "".join(
+                f'<input type="hidden" name="{escape(name)}" value="{escape(value)}">'
+                for name, value in args.items()
+            )
+            return (
+                f'<form method="get">{hidden}<input name="email" placeholder="email">'
+                '<button type="submit">login</button></form>'
+            )
+
+        code = secrets.token_urlsafe(16)
+        codes[code] = {
+            "email": email,
+            "client_id": args.get("client_id"),
+            "nonce": args.get("nonce"),
+        }
+        query = urllib_parse.urlencode({"code": code, "state": args.get("state", "")})
+        return flask.redirect(f"{args['redirect_uri']}?{query}")
+
+    @app.post("/token")
+    def token():
+        grant = codes.pop(flask.request.form.get("code", ""), None)
+        if grant is None or grant["client_id"] != flask.request.form.get("client_id"):
+            return {"error": "invalid_grant"}, 400
+
+        now = int(time.time())
+        claims = {
+            "iss": issuer,
+            "aud": grant["client_id"],
+            "sub": hashlib.sha256(grant["email"].encode()).hexdigest(),
+            "email": grant["email"],
+            "email_verified": True,
+            "iat": now,
+            "exp": now + 3600,
+        }
+        if grant["nonce"]:
+            claims["nonce"] = grant["nonce"]
+
+        access_token = secrets.token_urlsafe(32)
+        tokens[access_token] = grant["email"]
+        return {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "id_token": jwt.encode(claims, key, "RS256", {"kid": kid}),
+        }
+
+    @app.get("/certs")
+    def certs():
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+        response = flask.jsonify(
+            {"keys": [{**jwk, "alg": "RS256", "use": "sig", "kid": kid}]}
+        )
+        response.headers["Cache-Control"] = "public, max-age=3600"
+        return response
+
+    @app.get("/userinfo")
+    def userinfo():
+        access_token = flask.request.headers.get("Authorization", "").removeprefix(
+            "Bearer "
+        )
+        if access_token not in tokens:
+            return {"error": "invalid_token"}, 401
+        return {"email": tokens[access_token], "email_verified": True}
+
+    return app
+
+
+def main() -> None:
+    argv = sys.argv
+    if len(argv) > 2:
+        logging.error(f"Usage: {argv[0]} [port]")
+        exit(1)
+
+    port = int(argv[1]) if len(argv) > 1 else 5001
+    create_app(f"http://localhost:{port}").run(port=port)
+
+
+if __name__ == "__main__":
+    main()